@@ -0,0 +1,294 @@
+"""Endpoint latency/throughput benchmark for the API, run in-process.
+
+Drives ``server.app`` through httpx's ASGI transport against the local
+mongod, after generating a synthetic dataset with seed_data.generate_dataset
+for each size. The app's startup and shutdown hooks run around the whole
+run. Data goes to a separate database (DB_NAME + "_benchmark", or
+BENCHMARK_DB_NAME) since every size is regenerated from scratch.
+
+For every scenario it reports p50/p95/p99 latency, throughput and the number
+of Mongo commands issued per request, and writes the results to a JSON
+baseline that later runs can be compared against:
+
+    python benchmark_endpoints.py --sizes small,medium --output baseline.json
+    python benchmark_endpoints.py --sizes small --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+os.environ['DB_NAME'] = os.environ.get('BENCHMARK_DB_NAME', os.environ['DB_NAME'] + '_benchmark')
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts every command sent by clients created after registration."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+# Must be registered before server creates its client
+commands = CommandCounter()
+monitoring.register(commands)
+
+import httpx  # noqa: E402
+import server  # noqa: E402
+from server import app  # noqa: E402
+from seed_data import generate_dataset  # noqa: E402
+
+SIZES = {
+    "small": dict(schools=1, classes=5, students=30, lessons=2, months=2),
+    "medium": dict(schools=5, classes=10, students=40, lessons=5, months=3),
+    "large": dict(schools=20, classes=10, students=40, lessons=10, months=6),
+}
+CLASS_NAME = "Class 8A-S1"
+TEACHER = ("teacher1-8a@school.test", "teacher123")
+STUDENT = ("student1-8a-1@school.test", "student123")
+
+def percentile(sorted_values, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def check(response: httpx.Response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: {response.status_code}")
+
+# ============= Scenarios =============
+
+async def login(http, ctx, rng):
+    check(await http.post("/auth/login", json={"email": STUDENT[0], "password": STUDENT[1]}))
+
+async def lessons_full(http, ctx, rng):
+    check(await http.get("/lessons"))
+
+async def lessons_summary(http, ctx, rng):
+    check(await http.get("/lessons", params={"lang": "punjabi", "view": "summary"}))
+
+async def student_dashboard(http, ctx, rng):
+    # The fan-out StudentDashboard.js issues on load
+    headers = ctx['student']
+    for response in await asyncio.gather(
+        http.get("/lessons"), http.get("/digital-literacy"),
+        http.get("/assignments", headers=headers), http.get("/progress", headers=headers)
+    ):
+        check(response)
+
+async def teacher_dashboard(http, ctx, rng):
+    # TeacherDashboard.js: three lists together, then class analytics
+    headers = ctx['teacher']
+    for response in await asyncio.gather(
+        http.get("/students", params={"class_name": CLASS_NAME}, headers=headers),
+        http.get("/assignments", headers=headers), http.get("/submissions", headers=headers)
+    ):
+        check(response)
+    check(await http.get(f"/analytics/class/{CLASS_NAME}", headers=headers))
+
+async def student_bootstrap(http, ctx, rng):
+    check(await http.get("/bootstrap/student", headers=ctx['student']))
+
+async def teacher_bootstrap(http, ctx, rng):
+    check(await http.get("/bootstrap/teacher", params={"class_name": CLASS_NAME}, headers=ctx['teacher']))
+
+async def mark_attendance(http, ctx, rng):
+    day = rng.choice(ctx['days'])
+    check(await http.post("/attendance", headers=ctx['teacher'], json={
+        "class_name": CLASS_NAME, "date": day.isoformat(),
+        "students": [{"student_id": sid, "status": rng.choice(["present", "present", "absent"])}
+                     for sid in ctx['students']]
+    }))
+
+async def post_progress(http, ctx, rng):
+    check(await http.post("/progress", headers=ctx['student'], json={
+        "lesson_id": rng.choice(ctx['lessons']),
+        "completion_percentage": float(rng.randint(0, 100)),
+        "time_spent": rng.randint(30, 1800)
+    }))
+
+async def progress_heartbeat(http, ctx, rng):
+    check(await http.post("/progress/heartbeat", headers=ctx['student'], json={
+        "lesson_id": rng.choice(ctx['lessons']),
+        "completion_percentage": float(rng.randint(0, 100)),
+        "time_spent": rng.randint(30, 1800)
+    }))
+
+async def class_analytics(http, ctx, rng):
+    check(await http.get(f"/analytics/class/{CLASS_NAME}", headers=ctx['teacher']))
+
+SCENARIOS = {
+    "login": login,
+    "lessons": lessons_full,
+    "lessons_summary": lessons_summary,
+    "student_dashboard": student_dashboard,
+    "teacher_dashboard": teacher_dashboard,
+    "student_bootstrap": student_bootstrap,
+    "teacher_bootstrap": teacher_bootstrap,
+    "attendance_mark": mark_attendance,
+    "progress_post": post_progress,
+    "progress_heartbeat": progress_heartbeat,
+    "class_analytics": class_analytics,
+}
+
+# ============= Runner =============
+
+async def prepare(http) -> dict:
+    tokens = {}
+    for role, (email, password) in (("teacher", TEACHER), ("student", STUDENT)):
+        response = await http.post("/auth/login", json={"email": email, "password": password})
+        check(response)
+        tokens[role] = {"Authorization": f"Bearer {response.json()['token']}"}
+    students = (await http.get("/students", params={"class_name": CLASS_NAME}, headers=tokens['teacher'])).json()
+    lessons = (await http.get("/lessons", params={"view": "summary"})).json()
+    today = date.today()
+    return {
+        **tokens,
+        "students": [s['id'] for s in students],
+        "lessons": [lesson['id'] for lesson in lessons],
+        "days": [today - timedelta(days=n) for n in range(60) if (today - timedelta(days=n)).weekday() < 6],
+    }
+
+async def run_scenario(http, ctx, scenario, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    for _ in range(min(10, requests // 10)):
+        await scenario(http, ctx, rng)
+
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                await scenario(http, ctx, rng)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    commands_before = commands.count
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "mongo_ops_per_request": round((commands.count - commands_before) / requests, 2),
+    }
+
+async def reset_caches():
+    # The dataset was replaced underneath the app; nothing cached from the
+    # previous size may be served for this one.
+    server.catalog_cache.bump()
+    server.user_cache.clear()
+    await server.refresh_search_index()
+
+async def run(sizes, scenarios, requests: int, concurrency: int, seed: int) -> dict:
+    # ASGITransport doesn't send lifespan events, so run the hooks directly:
+    # they build indexes and start the progress buffer.
+    await app.router.startup()
+    try:
+        await app.state.index_task
+        await app.state.search_index_task
+        return await run_sizes(sizes, scenarios, requests, concurrency, seed)
+    finally:
+        await app.router.shutdown()
+
+async def run_sizes(sizes, scenarios, requests: int, concurrency: int, seed: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark/api", timeout=None) as http:
+        for size in sizes:
+            print(f"\n=== {size}: generating {SIZES[size]} ===")
+            await generate_dataset(**SIZES[size], seed=seed)
+            await reset_caches()
+            ctx = await prepare(http)
+            results[size] = {}
+            print(f"{'scenario':<20} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'ops/req':>8} {'errors':>7}")
+            for name in scenarios:
+                stats = await run_scenario(http, ctx, SCENARIOS[name], requests, concurrency, seed)
+                results[size][name] = stats
+                print(f"{name:<20} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+                      f"{stats['throughput_rps']:>8.1f} {stats['mongo_ops_per_request']:>8.2f} {stats['errors']:>7}")
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Scenarios whose p95 grew by more than ``tolerance`` over the baseline."""
+    regressions = []
+    print(f"\n{'size/scenario':<32} {'base p95':>9} {'p95':>9} {'change':>8}")
+    for size, scenarios in results.items():
+        for name, stats in scenarios.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if not before or not before['p95_ms']:
+                continue
+            change = stats['p95_ms'] / before['p95_ms'] - 1
+            flag = " REGRESSION" if change > tolerance else ""
+            print(f"{size + '/' + name:<32} {before['p95_ms']:>9.2f} {stats['p95_ms']:>9.2f} {change:>+7.0%}{flag}")
+            if flag:
+                regressions.append(f"{size}/{name}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="small", help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_baseline.json")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exits non-zero on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth over the baseline")
+    args = parser.parse_args()
+
+    sizes = args.sizes.split(",")
+    scenarios = args.scenarios.split(",")
+    for name in [s for s in sizes if s not in SIZES] + [s for s in scenarios if s not in SCENARIOS]:
+        parser.error(f"unknown size or scenario: {name}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = asyncio.run(run(sizes, scenarios, args.requests, args.concurrency, args.seed))
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "config": {"requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+                   "sizes": {size: SIZES[size] for size in sizes}},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"p95 regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,66 @@
+"""Encode-time and compressed-size benchmark for API payloads.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps, as used by
+JSONResponse) against the orjson encoder used by MongoJSONResponse, and
+reports the bytes gzip and brotli save, for payloads built from whatever is
+currently in the database (run seed_data.py first).
+
+    python benchmark_serialization.py [--iterations 200]
+"""
+import argparse
+import asyncio
+import json
+import time
+import gzip
+
+from fastapi.encoders import jsonable_encoder
+
+from server import (
+    BROTLI_QUALITY, GZIP_LEVEL, LESSON_LOCALIZED_FIELDS, LESSON_SUMMARY_EXCLUDES,
+    brotli, catalog_projection, client, compute_class_analytics, db, dumps_json
+)
+
+def default_encode(content):
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+def time_per_call(fn, content, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(content)
+    return (time.perf_counter() - start) / iterations * 1000
+
+async def load_payloads():
+    payloads = {
+        "lessons": await db.lessons.find({}, {"_id": 0}).to_list(None),
+        "lessons?lang=punjabi&view=summary": await db.lessons.find(
+            {}, catalog_projection(LESSON_LOCALIZED_FIELDS, "punjabi", LESSON_SUMMARY_EXCLUDES, True)
+        ).to_list(None),
+        "digital-literacy": await db.digital_literacy_modules.find({}, {"_id": 0}).to_list(None),
+    }
+    class_name = (await db.users.find_one({"role": "student", "class_name": {"$ne": None}}) or {}).get("class_name")
+    if class_name:
+        payloads[f"analytics/class/{class_name}"] = await compute_class_analytics(class_name)
+    return payloads
+
+async def main(iterations: int):
+    payloads = await load_payloads()
+    client.close()
+
+    print(f"{'payload':<40} {'default ms':>10} {'orjson ms':>10} {'speedup':>8} "
+          f"{'raw B':>9} {'gzip B':>9} {'br B':>9}")
+    for name, content in payloads.items():
+        default_ms = time_per_call(default_encode, content, iterations)
+        orjson_ms = time_per_call(dumps_json, content, iterations)
+        raw = dumps_json(content)
+        gz = gzip.compress(raw, compresslevel=GZIP_LEVEL)
+        br = brotli.compress(raw, quality=BROTLI_QUALITY) if brotli is not None else None
+        print(f"{name:<40} {default_ms:>10.3f} {orjson_ms:>10.3f} {default_ms / orjson_ms:>7.1f}x "
+              f"{len(raw):>9} {len(gz):>9} {len(br) if br is not None else '-':>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
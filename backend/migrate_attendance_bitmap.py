@@ -0,0 +1,114 @@
+"""Convert the per-day attendance collection into attendance_months bitmaps.
+
+Reads attendance in (student, class, date) order and merges each
+(class, student, month) into its bitmap document, so it is safe to re-run
+and leaves the source collection untouched. Switch the routes over with
+ATTENDANCE_STORE=bitmap once it has run.
+
+    python migrate_attendance_bitmap.py [--batch-size 1000] [--verify]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from server import client, db, day_bit, month_key, parse_attendance_date
+
+def month_ops(key: tuple, marked: int, present: int) -> list:
+    class_name, student_id, month = key
+    match = {"class_name": class_name, "month": month, "student_id": student_id}
+    now = datetime.now(timezone.utc)
+    return [
+        UpdateOne(match, {"$bit": {"marked": {"or": marked}, "present": {"or": present}},
+                          "$set": {"updated_at": now}}, upsert=True),
+        # Days recorded absent clear any present bit already in the bitmap
+        UpdateOne(match, {"$bit": {"present": {"and": ~(marked & ~present)}}}),
+    ]
+
+async def migrate(batch_size: int) -> dict:
+    stats = {"records": 0, "skipped": 0, "months": 0}
+    ops = []
+    key, marked, present = None, 0, 0
+
+    async def flush():
+        nonlocal ops
+        if ops:
+            # Ordered: each document's OR must land before its AND
+            await db.attendance_months.bulk_write(ops, ordered=True)
+            ops = []
+
+    cursor = db.attendance.find(
+        {}, {"_id": 0, "student_id": 1, "class_name": 1, "date": 1, "status": 1}
+    ).sort([("student_id", 1), ("class_name", 1), ("date", 1)]).batch_size(batch_size)
+    async for doc in cursor:
+        try:
+            # BSON dates, or YYYY-MM-DD strings not yet through migrate_bson_dates.py
+            day = doc['date'].date() if isinstance(doc.get('date'), datetime) else parse_attendance_date(doc.get('date'))
+        except Exception:
+            stats["skipped"] += 1
+            continue
+        doc_key = (doc['class_name'], doc['student_id'], month_key(day))
+        if doc_key != key:
+            if key is not None:
+                ops.extend(month_ops(key, marked, present))
+                stats["months"] += 1
+            key, marked, present = doc_key, 0, 0
+        bit = day_bit(day)
+        marked |= bit
+        if doc.get('status') == 'present':
+            present |= bit
+        else:
+            present &= ~bit
+        stats["records"] += 1
+        if len(ops) >= batch_size:
+            await flush()
+    if key is not None:
+        ops.extend(month_ops(key, marked, present))
+        stats["months"] += 1
+    await flush()
+    return stats
+
+async def verify() -> list:
+    """(student, class) pairs whose day counts differ between the two stores.
+
+    Duplicate records for the same day collapse into one bit, so stores
+    written before attendance was made unique can legitimately differ.
+    """
+    documents = {}
+    async for row in db.attendance.aggregate([
+        {"$group": {
+            "_id": {"student_id": "$student_id", "class_name": "$class_name"},
+            "marked": {"$sum": 1},
+            "present": {"$sum": {"$cond": [{"$eq": ["$status", "present"]}, 1, 0]}}
+        }}
+    ]):
+        documents[(row['_id']['student_id'], row['_id']['class_name'])] = (row['marked'], row['present'])
+    bitmaps = {}
+    async for doc in db.attendance_months.find({}, {"_id": 0, "student_id": 1, "class_name": 1, "marked": 1, "present": 1}):
+        k = (doc['student_id'], doc['class_name'])
+        m, p = bitmaps.get(k, (0, 0))
+        bitmaps[k] = (m + doc.get('marked', 0).bit_count(), p + (doc.get('present', 0) & doc.get('marked', 0)).bit_count())
+    return [
+        {"student_id": k[0], "class_name": k[1], "documents": documents.get(k), "bitmap": bitmaps.get(k)}
+        for k in set(documents) | set(bitmaps)
+        if documents.get(k) != bitmaps.get(k)
+    ]
+
+async def main(batch_size: int, check: bool):
+    stats = await migrate(batch_size)
+    print(f"✓ Migrated {stats['records']} attendance records into {stats['months']} month bitmaps"
+          f" ({stats['skipped']} skipped: unparseable date)")
+    if check:
+        mismatches = await verify()
+        print(f"✓ Verified: {len(mismatches)} mismatched student/class pairs")
+        for m in mismatches[:20]:
+            print(f"  {m}")
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert attendance into month bitmaps.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--verify", action="store_true", help="compare per-student counts afterwards")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.verify))
@@ -0,0 +1,119 @@
+"""Convert ISO-string timestamps to native BSON dates, online.
+
+Older documents store timestamps as isoformat() strings (and attendance days
+as YYYY-MM-DD), which only compare as text. This walks each collection in
+_id order, a batch at a time, and rewrites string values of the timestamp
+fields as UTC dates while the API keeps serving.
+
+Each update matches the string it read, so a document rewritten by the API
+in the meantime is left alone. Values that don't parse are counted and
+skipped. An attendance day that was re-marked after the deploy (so it
+exists both as a string and as a date) keeps the newer, date-typed record.
+Rollups are rebuilt at the end, since such duplicates were counted twice.
+Safe to re-run.
+
+    python migrate_bson_dates.py [--batch-size 1000] [--verify]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from server import client, db, rebuild_rollups
+
+TIMESTAMP_FIELDS = {
+    "users": ("created_at",),
+    "lessons": ("created_at", "updated_at"),
+    "digital_literacy_modules": ("created_at", "updated_at"),
+    "assignments": ("created_at", "due_date", "updated_at"),
+    "submissions": ("submitted_at",),
+    "attendance": ("date", "created_at"),
+    "attendance_months": ("updated_at",),
+    "progress": ("last_accessed", "client_timestamp", "updated_at"),
+    "tombstones": ("deleted_at",),
+    "analytics_rollups": ("updated_at",),
+}
+
+def to_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)  # YYYY-MM-DD gives midnight
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def string_fields_query(fields) -> dict:
+    return {"$or": [{field: {"$type": "string"}} for field in fields]}
+
+async def drop_superseded_attendance(ops: list, error_indexes: list) -> int:
+    """Delete string-dated attendance whose day was re-marked with a date-typed record."""
+    dropped = 0
+    for index in error_indexes:
+        match = ops[index]._filter
+        result = await db.attendance.delete_one(match)
+        dropped += result.deleted_count
+    return dropped
+
+async def migrate_collection(name: str, fields, batch_size: int) -> dict:
+    stats = {"documents": 0, "values": 0, "unparseable": 0, "superseded": 0}
+    collection = db[name]
+    last_id = None
+    while True:
+        query = string_fields_query(fields)
+        if last_id is not None:
+            query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        batch = await collection.find(query, {field: 1 for field in fields}).sort("_id", 1).to_list(batch_size)
+        if not batch:
+            return stats
+        last_id = batch[-1]['_id']
+
+        ops = []
+        for doc in batch:
+            match, update = {"_id": doc['_id']}, {}
+            for field in fields:
+                value = doc.get(field)
+                if not isinstance(value, str):
+                    continue
+                try:
+                    update[field] = to_datetime(value)
+                except ValueError:
+                    stats["unparseable"] += 1
+                    continue
+                match[field] = value
+            if update:
+                ops.append(UpdateOne(match, {"$set": update}))
+                stats["values"] += len(update)
+        if not ops:
+            continue
+        try:
+            result = await collection.bulk_write(ops, ordered=False)
+            stats["documents"] += result.modified_count
+        except BulkWriteError as e:
+            duplicates = [error['index'] for error in e.details.get('writeErrors', []) if error.get('code') == 11000]
+            if name != "attendance" or len(duplicates) != len(e.details.get('writeErrors', [])):
+                raise
+            stats["documents"] += e.details.get('nModified', 0)
+            stats["superseded"] += await drop_superseded_attendance(ops, duplicates)
+
+async def remaining() -> dict:
+    return {
+        name: await db[name].count_documents(string_fields_query(fields))
+        for name, fields in TIMESTAMP_FIELDS.items()
+    }
+
+async def main(batch_size: int, check: bool):
+    for name, fields in TIMESTAMP_FIELDS.items():
+        stats = await migrate_collection(name, fields, batch_size)
+        print(f"✓ {name}: converted {stats['values']} values in {stats['documents']} documents"
+              f" ({stats['unparseable']} unparseable, {stats['superseded']} superseded attendance records dropped)")
+    report = await rebuild_rollups()
+    print(f"✓ Rebuilt {report['rollups']} analytics rollups")
+    if check:
+        left = {name: count for name, count in (await remaining()).items() if count}
+        print(f"✓ Verified: {sum(left.values())} documents still have string timestamps {left or ''}")
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert string timestamps to BSON dates.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--verify", action="store_true", help="count documents still holding string timestamps")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.verify))
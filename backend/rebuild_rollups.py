@@ -0,0 +1,16 @@
+import argparse
+import asyncio
+import json
+
+from server import client, rebuild_rollups
+
+async def main(check_only: bool):
+    report = await rebuild_rollups(check_only=check_only)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute analytics rollups from the raw collections.")
+    parser.add_argument("--check", action="store_true", help="only report drift, don't rewrite the rollups")
+    args = parser.parse_args()
+    asyncio.run(main(args.check))
@@ -1,10 +1,14 @@
+import argparse
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import random
+import time
 from dotenv import load_dotenv
 from pathlib import Path
 import uuid
-from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone, timedelta
 import bcrypt
 
 ROOT_DIR = Path(__file__).parent
@@ -14,8 +18,11 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Same cost as the server, so seeded accounts aren't rehashed on first login
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 async def seed_database():
     print("Starting database seeding...")
@@ -35,7 +42,7 @@ async def seed_database():
             "role": "admin",
             "school": "Government School Nabha",
             "language_preference": "punjabi",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -46,7 +53,7 @@ async def seed_database():
             "school": "Government School Nabha",
             "class_name": "Class 8A",
             "language_preference": "punjabi",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -57,7 +64,7 @@ async def seed_database():
             "school": "Government School Nabha",
             "class_name": "Class 8A",
             "language_preference": "punjabi",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -68,7 +75,7 @@ async def seed_database():
             "school": "Government School Nabha",
             "class_name": "Class 8A",
             "language_preference": "hindi",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
     ]
     
@@ -100,7 +107,7 @@ async def seed_database():
             "media_type": "text",
             "thumbnail": "https://images.unsplash.com/photo-1559827260-dc66d52bef19?w=400",
             "created_by": users[1]['id'],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -125,7 +132,7 @@ async def seed_database():
             "media_type": "text",
             "thumbnail": "https://images.unsplash.com/photo-1635070041078-e363dbe005cb?w=400",
             "created_by": users[1]['id'],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -150,7 +157,7 @@ async def seed_database():
             "media_type": "text",
             "thumbnail": "https://images.unsplash.com/photo-1524492412937-b28074a5d7da?w=400",
             "created_by": users[1]['id'],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
     ]
     
@@ -190,7 +197,7 @@ async def seed_database():
                     "answer": "Keyboard"
                 }
             ],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -223,7 +230,7 @@ async def seed_database():
                     "answer": "No"
                 }
             ],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -254,7 +261,7 @@ async def seed_database():
                     "text": "The quick brown fox jumps over the lazy dog"
                 }
             ],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -285,7 +292,7 @@ async def seed_database():
                     "instruction": "Create a sequence to move forward 3 steps"
                 }
             ],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -316,7 +323,7 @@ async def seed_database():
                     "instruction": "Draw a house using basic shapes"
                 }
             ],
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
     ]
     
@@ -330,5 +337,253 @@ async def seed_database():
     print("Student: student1@school.com / student123")
     print("Student: student2@school.com / student123")
 
+# ============= Synthetic Dataset =============
+
+GRADES = ["6", "7", "8", "9", "10"]
+SUBJECTS = ["Science", "Mathematics", "History", "Geography", "Punjabi", "Hindi", "English"]
+LANGUAGES = ["punjabi", "hindi", "english"]
+WORDS = {
+    "punjabi": ["ਪਾਣੀ", "ਚੱਕਰ", "ਗਣਿਤ", "ਵਿਗਿਆਨ", "ਇਤਿਹਾਸ", "ਪੌਦੇ", "ਧਰਤੀ", "ਭਿੰਨ", "ਕਹਾਣੀ", "ਪਿੰਡ", "ਸੂਰਜ", "ਊਰਜਾ"],
+    "hindi": ["पानी", "चक्र", "गणित", "विज्ञान", "इतिहास", "पौधे", "धरती", "भिन्न", "कहानी", "गाँव", "सूरज", "ऊर्जा"],
+    "english": ["water", "cycle", "fractions", "science", "history", "plants", "earth", "geometry", "story", "village", "sun", "energy"],
+}
+STUDENT_PASSWORD = "student123"
+TEACHER_PASSWORD = "teacher123"
+# Collections the generator owns; users/lessons/modules are reset by seed_database()
+GENERATED_COLLECTIONS = ["assignments", "submissions", "attendance", "attendance_months", "progress", "analytics_rollups"]
+
+def localized(rng: random.Random, words: int) -> dict:
+    return {lang: " ".join(rng.choices(WORDS[lang], k=words)) for lang in LANGUAGES}
+
+def midnight(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+def school_days(months: int):
+    """Monday-Saturday dates from the start of ``months`` months ago up to today."""
+    today = date.today()
+    first = today.replace(day=1)
+    for _ in range(months - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+    day = first
+    while day <= today:
+        if day.weekday() < 6:
+            yield day
+        day += timedelta(days=1)
+
+def class_names(school: int, classes: int):
+    """(grade, section code, class name) per class. The app keys classes by
+    name alone, so names carry the school: "Class 8A-S1"."""
+    for c in range(classes):
+        grade = GRADES[c % len(GRADES)]
+        code = f"{grade}{chr(ord('A') + c // len(GRADES))}"
+        yield grade, code, f"Class {code}-S{school}"
+
+async def insert_batched(collection, docs, batch_size: int, concurrency: int = 4) -> int:
+    """insert_many ``docs`` in unordered batches, a few batches in flight at once."""
+    pending = set()
+    batch = []
+    count = 0
+
+    async def flush(batch):
+        await collection.insert_many(batch, ordered=False)
+
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            pending.add(asyncio.ensure_future(flush(batch)))
+            count += len(batch)
+            batch = []
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+    if batch:
+        pending.add(asyncio.ensure_future(flush(batch)))
+        count += len(batch)
+    for task in asyncio.as_completed(pending):
+        await task
+    return count
+
+def password_hashes(passwords, hash_workers: int):
+    """One salted hash per password, spread over ``hash_workers`` processes."""
+    with ProcessPoolExecutor(max_workers=hash_workers) as pool:
+        return list(pool.map(hash_password, passwords, chunksize=256))
+
+async def generate_dataset(schools: int = 2, classes: int = 5, students: int = 40,
+                           lessons: int = 3, months: int = 3, batch_size: int = 5000,
+                           hash_workers: int = 0, seed: int = 1):
+    """Seed a synthetic district for load testing.
+
+    schools x classes x students accounts with a teacher per class,
+    ``lessons`` lessons per subject and grade, and ``months`` months of
+    attendance, assignments, submissions and progress. Every generated
+    account shares one precomputed password hash unless ``hash_workers`` is
+    set, in which case each gets its own salt, hashed in a process pool.
+    Indexes are built after the load and analytics rollups recomputed.
+    """
+    from server import ATTENDANCE_STORE, change_stamp, ensure_indexes, rebuild_rollups, sync_sequence
+
+    started = time.monotonic()
+    rng = random.Random(seed)
+    await seed_database()
+    for name in GENERATED_COLLECTIONS:
+        await db[name].delete_many({})
+    # Everything generated belongs to a single change set
+    # (pending until the last insert, so /sync holds its token back meanwhile)
+    seq = await sync_sequence.allocate()
+    stamp = change_stamp(seq)
+    now = datetime.now(timezone.utc)
+
+    # Users
+    roster = []  # (school, class_name, grade, teacher, [student ids])
+    users = []
+    for s in range(1, schools + 1):
+        school = f"Government School {s}"
+        for grade, code, class_name in class_names(s, classes):
+            teacher = {
+                "id": str(uuid.uuid4()), "name": f"Teacher {s}-{code}",
+                "email": f"teacher{s}-{code.lower()}@school.test", "role": "teacher",
+                "school": school, "class_name": class_name,
+                "language_preference": rng.choice(LANGUAGES), "created_at": now
+            }
+            users.append(teacher)
+            student_ids = []
+            for i in range(1, students + 1):
+                student = {
+                    "id": str(uuid.uuid4()), "name": f"Student {s}-{code}-{i}",
+                    "email": f"student{s}-{code.lower()}-{i}@school.test", "role": "student",
+                    "school": school, "class_name": class_name,
+                    "language_preference": rng.choice(LANGUAGES), "created_at": now
+                }
+                users.append(student)
+                student_ids.append(student['id'])
+            roster.append((school, class_name, grade, teacher, student_ids))
+    passwords = [TEACHER_PASSWORD if user['role'] == 'teacher' else STUDENT_PASSWORD for user in users]
+    if hash_workers:
+        hashes = password_hashes(passwords, hash_workers)
+    else:
+        shared = {password: hash_password(password) for password in set(passwords)}
+        hashes = [shared[password] for password in passwords]
+    for user, hashed in zip(users, hashes):
+        user['password'] = hashed
+    print(f"✓ Created {await insert_batched(db.users, users, batch_size)} users")
+    del users, hashes
+
+    # Lessons
+    lesson_ids = {}  # grade -> [lesson ids]
+    def lesson_docs():
+        for grade in GRADES:
+            for subject in SUBJECTS:
+                for _ in range(lessons):
+                    doc = {
+                        "id": str(uuid.uuid4()), "title": localized(rng, 4),
+                        "description": localized(rng, 12), "content": localized(rng, 120),
+                        "subject": subject, "grade": f"Class {grade}", "language": "multilingual",
+                        "media_type": "text", "thumbnail": None, "created_by": "seed",
+                        "created_at": now, **stamp
+                    }
+                    lesson_ids.setdefault(grade, []).append(doc['id'])
+                    yield doc
+    print(f"✓ Created {await insert_batched(db.lessons, lesson_docs(), batch_size)} lessons")
+    module_ids = [m['id'] async for m in db.digital_literacy_modules.find({}, {"_id": 0, "id": 1})]
+    days = list(school_days(months))
+
+    # Attendance
+    def attendance_docs():
+        for school, class_name, grade, teacher, student_ids in roster:
+            for student_id in student_ids:
+                rate = rng.uniform(0.7, 0.98)
+                if ATTENDANCE_STORE == 'bitmap':
+                    months_bits = {}
+                    for day in days:
+                        bits = months_bits.setdefault(day.strftime('%Y-%m'), [0, 0])
+                        bits[0] |= 1 << (day.day - 1)
+                        if rng.random() < rate:
+                            bits[1] |= 1 << (day.day - 1)
+                    for month, (marked, present) in months_bits.items():
+                        yield {"class_name": class_name, "month": month, "student_id": student_id,
+                               "marked": marked, "present": present, "updated_at": now}
+                else:
+                    for day in days:
+                        yield {
+                            "id": str(uuid.uuid4()), "student_id": student_id, "class_name": class_name,
+                            "date": midnight(day), "status": 'present' if rng.random() < rate else 'absent',
+                            "marked_by": teacher['id'], "created_at": now
+                        }
+    attendance = db.attendance_months if ATTENDANCE_STORE == 'bitmap' else db.attendance
+    print(f"✓ Created {await insert_batched(attendance, attendance_docs(), batch_size)} attendance records")
+
+    # Assignments: one per class per week, most students submit, most get graded
+    assignments = []
+    for school, class_name, grade, teacher, student_ids in roster:
+        for due in days[5::6]:
+            assignments.append((school, class_name, student_ids, {
+                "id": str(uuid.uuid4()), "title": f"Weekly work {due.isoformat()}",
+                "description": "Complete the exercises from this week's lessons",
+                "lesson_id": rng.choice(lesson_ids.get(grade) or [None]), "teacher_id": teacher['id'],
+                "class_name": class_name, "due_date": midnight(due),
+                "total_marks": 100, "created_at": now, **stamp
+            }))
+    print(f"✓ Created {await insert_batched(db.assignments, (a[3] for a in assignments), batch_size)} assignments")
+
+    def submission_docs():
+        for school, class_name, student_ids, assignment in assignments:
+            due = assignment['due_date']
+            for student_id in student_ids:
+                if rng.random() >= 0.85:
+                    continue
+                graded = rng.random() < 0.7
+                yield {
+                    "id": str(uuid.uuid4()), "assignment_id": assignment['id'], "student_id": student_id,
+                    "content": "Answers attached", "class_name": class_name, "school": school,
+                    "marks": rng.randint(35, 100) if graded else None,
+                    "feedback": "Good work" if graded else None,
+                    "submitted_at": due - timedelta(hours=rng.randint(1, 72))
+                }
+    print(f"✓ Created {await insert_batched(db.submissions, submission_docs(), batch_size)} submissions")
+
+    # Progress: a share of the grade's lessons and a few modules per student
+    def progress_docs():
+        for school, class_name, grade, teacher, student_ids in roster:
+            grade_lessons = lesson_ids.get(grade, [])
+            for student_id in student_ids:
+                targets = [(lesson_id, None) for lesson_id in rng.sample(grade_lessons, min(len(grade_lessons), 10))]
+                targets += [(None, module_id) for module_id in rng.sample(module_ids, min(len(module_ids), 3))]
+                for lesson_id, module_id in targets:
+                    accessed = midnight(rng.choice(days))
+                    yield {
+                        "id": str(uuid.uuid4()), "student_id": student_id,
+                        "lesson_id": lesson_id, "module_id": module_id,
+                        "completion_percentage": float(rng.choice([10, 25, 50, 75, 100])),
+                        "time_spent": rng.randint(60, 3600), "last_accessed": accessed,
+                        "client_timestamp": accessed, **stamp
+                    }
+    print(f"✓ Created {await insert_batched(db.progress, progress_docs(), batch_size)} progress records")
+    sync_sequence.settle(seq)
+    await sync_sequence.publish()
+
+    await ensure_indexes()
+    result = await rebuild_rollups()
+    print(f"✓ Rebuilt {result['rollups']} analytics rollups")
+    print(f"\n=== Generated dataset in {time.monotonic() - started:.1f}s ===")
+    print(f"Teacher: teacher1-8a@school.test / {TEACHER_PASSWORD}")
+    print(f"Student: student1-8a-1@school.test / {STUDENT_PASSWORD}")
+
 if __name__ == "__main__":
-    asyncio.run(seed_database())
+    parser = argparse.ArgumentParser(description="Seed demo data, or generate a synthetic district with --generate.")
+    parser.add_argument("--generate", action="store_true", help="generate a synthetic dataset for load testing")
+    parser.add_argument("--schools", type=int, default=2)
+    parser.add_argument("--classes", type=int, default=5, help="classes per school")
+    parser.add_argument("--students", type=int, default=40, help="students per class")
+    parser.add_argument("--lessons", type=int, default=3, help="lessons per subject and grade")
+    parser.add_argument("--months", type=int, default=3, help="months of history")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--hash-workers", type=int, default=0,
+                        help="hash each account's password separately in this many processes (default: one shared hash)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    args = parser.parse_args()
+    if args.generate:
+        asyncio.run(generate_dataset(args.schools, args.classes, args.students, args.lessons, args.months,
+                                     args.batch_size, args.hash_workers, args.seed))
+    else:
+        asyncio.run(seed_database())
@@ -1,25 +1,436 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Match
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReplaceOne, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
+from bson.errors import InvalidId
+import asyncio
+import base64
+import binascii
+import csv
+import hashlib
+import heapq
+import io
 import os
 import logging
+import math
+import re
+import threading
+import unicodedata
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 import uuid
-from datetime import datetime, timezone, timedelta
+import time
+from collections import Counter, OrderedDict, deque
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import date as Date, datetime, timezone, timedelta
 import jwt
 import bcrypt
+import orjson
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# ============= Metrics =============
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+def _label_value(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Metric:
+    """A Prometheus counter or gauge family, one sample per label-value tuple.
+
+    Updated from the event loop and from Motor's worker threads (via the
+    command listener), hence the lock.
+    """
+
+    def __init__(self, name: str, help: str, kind: str, labels: tuple):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, Any] = {}
+        METRICS.append(self)
+
+    def inc(self, values: tuple, amount: float = 1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def set(self, values: tuple, value: float):
+        with self._lock:
+            self._values[values] = value
+
+    def _labels(self, values: tuple, extra: str = '') -> str:
+        pairs = [f'{name}="{_label_value(value)}"' for name, value in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(values)} {value}" for values, value in self._values.items()]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            samples = self._samples()
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *samples]
+
+class Histogram(Metric):
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple):
+        super().__init__(name, help, 'histogram', labels)
+        self.buckets = buckets
+
+    def observe(self, values: tuple, amount: float):
+        with self._lock:
+            sample = self._values.get(values)
+            if sample is None:
+                # per-bucket counts (non-cumulative), sum, count
+                sample = self._values[values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    sample[0][i] += 1
+                    break
+            sample[1] += amount
+            sample[2] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for values, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._labels(values, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{self._labels(values, le)} {count}")
+            lines.append(f"{self.name}_sum{self._labels(values)} {total}")
+            lines.append(f"{self.name}_count{self._labels(values)} {count}")
+        return lines
+
+METRICS: List[Metric] = []
+http_requests = Metric("http_requests_total", "HTTP requests by route and status.", "counter", ("method", "route", "status"))
+http_in_flight = Metric("http_requests_in_flight", "HTTP requests currently being served.", "gauge", ("method", "route"))
+http_duration = Histogram("http_request_duration_seconds", "HTTP request latency, including streaming the body.",
+                          ("method", "route"), LATENCY_BUCKETS)
+http_component_seconds = Histogram("http_request_component_seconds",
+                                   "Time per request spent in Mongo commands, bcrypt and response encoding.",
+                                   ("method", "route", "component"), LATENCY_BUCKETS)
+http_mongo_commands = Histogram("http_request_mongo_commands", "Mongo commands issued per request.",
+                                ("method", "route"), COUNT_BUCKETS)
+mongo_command_seconds = Histogram("mongodb_command_duration_seconds", "Mongo command latency.",
+                                  ("collection", "command", "route"), MONGO_BUCKETS)
+mongo_documents_returned = Metric("mongodb_documents_returned_total", "Documents returned by Mongo commands.",
+                                  "counter", ("collection", "command", "route"))
+mongo_command_failures = Metric("mongodb_command_failures_total", "Mongo commands that failed.",
+                                "counter", ("collection", "command", "route"))
+password_jobs_gauge = Metric("password_jobs_pending", "bcrypt jobs queued or running on the password pool.", "gauge", ())
+
+class RequestMetrics:
+    """Per-request totals, filled in by whatever the request ends up calling."""
+    __slots__ = ("method", "route", "mongo_seconds", "mongo_commands", "password_seconds", "encode_seconds", "commands")
+
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        self.mongo_seconds = 0.0
+        self.mongo_commands = 0
+        self.password_seconds = 0.0
+        self.encode_seconds = 0.0
+        # Every command issued, kept only while the query profiler is on
+        self.commands: Optional[List[Dict[str, Any]]] = [] if PROFILER_ENABLED else None
+
+# Motor runs commands on worker threads with a copy of the caller's context,
+# so the command listener sees the request that issued each command.
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request", default=None)
+
+def returned_documents(reply: Dict[str, Any]) -> int:
+    cursor = reply.get('cursor')
+    if cursor:
+        return len(cursor.get('firstBatch') or cursor.get('nextBatch') or ())
+    if 'value' in reply:  # findAndModify
+        return 1 if reply['value'] else 0
+    return 0
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._started: Dict[tuple, tuple] = {}
+
+    def started(self, event):
+        target = event.command.get('collection' if event.command_name == 'getMore' else event.command_name)
+        request = current_request.get()
+        spec = None
+        if request is not None and request.commands is not None and event.command_name in EXPLAINABLE_COMMANDS:
+            spec = {k: v for k, v in event.command.items() if not k.startswith('$') and k not in PROFILER_DROPPED_FIELDS}
+        self._started[(event.connection_id, event.request_id)] = (
+            target if isinstance(target, str) else '', request, spec
+        )
+
+    def succeeded(self, event):
+        self._finish(event, returned_documents(event.reply))
+
+    def failed(self, event):
+        self._finish(event, 0, failed=True)
+
+    def _finish(self, event, returned: int, failed: bool = False):
+        collection, request, spec = self._started.pop((event.connection_id, event.request_id), ('', None, None))
+        seconds = event.duration_micros / 1_000_000
+        labels = (collection, event.command_name, request.route if request else 'background')
+        mongo_command_seconds.observe(labels, seconds)
+        if returned:
+            mongo_documents_returned.inc(labels, returned)
+        if failed:
+            mongo_command_failures.inc(labels)
+        if request is not None:
+            request.mongo_seconds += seconds
+            request.mongo_commands += 1
+            if request.commands is not None:
+                request.commands.append({
+                    "collection": collection, "command": event.command_name, "shape": query_shape(spec),
+                    "seconds": seconds, "returned": returned, "failed": failed, "spec": spec
+                })
+
+def route_template(scope) -> str:
+    """The path template of the route a request will hit, so ids don't explode label cardinality."""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    """Per-route request counts, in-flight gauge and latency histograms."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        route = route_template(scope)
+        request = RequestMetrics(method, route)
+        token = current_request.set(request)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        labels = (method, route)
+        http_in_flight.inc(labels)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_duration.observe(labels, time.perf_counter() - start)
+            http_in_flight.inc(labels, -1)
+            http_requests.inc((method, route, status_code))
+            http_component_seconds.observe((method, route, "mongo"), request.mongo_seconds)
+            http_component_seconds.observe((method, route, "password"), request.password_seconds)
+            http_component_seconds.observe((method, route, "encode"), request.encode_seconds)
+            http_mongo_commands.observe(labels, request.mongo_commands)
+            current_request.reset(token)
+            if request.commands is not None:
+                profile_request(request, scope.get("path", ""), time.perf_counter() - start)
+
+# ============= Query Profiler =============
+
+# Debug mode: keep every command a request issues and, for slow requests or
+# repeated per-item queries, record a finding with explain() plans of the
+# slow commands. Findings are in a ring buffer at GET /api/admin/profiler.
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+PROFILER_SLOW_REQUEST_SECONDS = float(os.environ.get('PROFILER_SLOW_REQUEST_SECONDS', '0.5'))
+PROFILER_SLOW_QUERY_SECONDS = float(os.environ.get('PROFILER_SLOW_QUERY_SECONDS', '0.05'))
+PROFILER_N_PLUS_ONE = int(os.environ.get('PROFILER_N_PLUS_ONE', '5'))  # same query shape this often in one request
+PROFILER_MAX_EXPLAINS = 5
+PROFILER_BUFFER_SIZE = int(os.environ.get('PROFILER_BUFFER_SIZE', '200'))
+
+EXPLAINABLE_COMMANDS = ("find", "aggregate", "count", "distinct", "findAndModify", "update", "delete")
+# Session/cluster fields explain() must not be given
+PROFILER_DROPPED_FIELDS = ("lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern")
+
+profiler_findings: deque = deque(maxlen=PROFILER_BUFFER_SIZE)
+
+def command_filter(spec: Dict[str, Any]) -> Any:
+    if 'filter' in spec:
+        return spec['filter']
+    if 'query' in spec:
+        return spec['query']
+    for statements in ('updates', 'deletes'):
+        if spec.get(statements):
+            return spec[statements][0].get('q')
+    stages = [stage for stage in spec.get('pipeline', ()) if '$match' in stage]
+    return stages[0]['$match'] if stages else None
+
+def shape_of(value: Any) -> Any:
+    """A query with its values replaced by '?', so per-item queries compare equal."""
+    if isinstance(value, dict):
+        return {key: shape_of(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [shape_of(value[0])] if value else []
+    return '?'
+
+def query_shape(spec: Optional[Dict[str, Any]]) -> Optional[str]:
+    if spec is None:
+        return None
+    return orjson.dumps(shape_of(command_filter(spec)), option=orjson.OPT_SORT_KEYS).decode()
+
+def plan_summary(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Stages and indexes of every winning plan in an explain() result."""
+    stages, indexes = [], []
+
+    def walk(node, in_plan=False):
+        if isinstance(node, dict):
+            if in_plan and 'stage' in node:
+                stages.append(node['stage'])
+                if 'indexName' in node:
+                    indexes.append(node['indexName'])
+            for key, value in node.items():
+                walk(value, in_plan or key == 'winningPlan')
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+
+    walk(explain)
+    return {"stages": stages, "indexes": indexes, "collscan": "COLLSCAN" in stages}
+
+async def explain_command(command: Dict[str, Any]) -> Dict[str, Any]:
+    spec = dict(command['spec'])
+    for statements in ('updates', 'deletes'):
+        if statements in spec:
+            spec[statements] = spec[statements][:1]  # explain takes a single statement
+    try:
+        return plan_summary(await db.command({"explain": spec, "verbosity": "queryPlanner"}))
+    except Exception as e:
+        return {"error": str(e)}
+
+async def record_finding(finding: Dict[str, Any], slow: List[Dict[str, Any]]):
+    for command, entry in zip(slow, finding['slow_commands']):
+        entry['plan'] = await explain_command(command)
+        if entry['plan'].get('collscan'):
+            logger.warning("COLLSCAN on %s.%s %s (%s)", command['collection'], command['command'],
+                           command['shape'], finding['route'])
+    profiler_findings.append(finding)
+
+def profile_request(request: RequestMetrics, path: str, seconds: float):
+    commands = request.commands
+    repeated = Counter(
+        (c['collection'], c['command'], c['shape']) for c in commands if c['shape'] is not None
+    )
+    n_plus_one = [
+        {"collection": collection, "command": command, "shape": shape, "count": count}
+        for (collection, command, shape), count in repeated.items() if count >= PROFILER_N_PLUS_ONE
+    ]
+    is_slow = seconds >= PROFILER_SLOW_REQUEST_SECONDS
+    if not is_slow and not n_plus_one:
+        return
+    if is_slow:
+        logger.warning("Slow request %s %s took %.0fms; %d Mongo commands:", request.method, path,
+                       seconds * 1000, len(commands))
+        for c in commands:
+            logger.warning("  %.1fms %s.%s %s returned=%d", c['seconds'] * 1000, c['collection'], c['command'],
+                           c['shape'] or '', c['returned'])
+    for group in n_plus_one:
+        logger.warning("Possible N+1 in %s: %s.%s %s issued %d times", request.route,
+                       group['collection'], group['command'], group['shape'], group['count'])
+
+    slow = sorted(
+        (c for c in commands if c['spec'] is not None and c['seconds'] >= PROFILER_SLOW_QUERY_SECONDS),
+        key=lambda c: c['seconds'], reverse=True
+    )[:PROFILER_MAX_EXPLAINS]
+    finding = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "method": request.method,
+        "route": request.route,
+        "path": path,
+        "duration_ms": round(seconds * 1000, 1),
+        "mongo_ms": round(request.mongo_seconds * 1000, 1),
+        "commands": [
+            {"collection": c['collection'], "command": c['command'], "shape": c['shape'],
+             "duration_ms": round(c['seconds'] * 1000, 2), "returned": c['returned'], "failed": c['failed']}
+            for c in commands
+        ],
+        "n_plus_one": n_plus_one,
+        "slow_commands": [
+            {"collection": c['collection'], "command": c['command'], "shape": c['shape'],
+             "duration_ms": round(c['seconds'] * 1000, 2)}
+            for c in slow
+        ],
+    }
+    # explain() runs after the response, outside the request it describes
+    asyncio.get_running_loop().create_task(record_finding(finding, slow))
+
+def render_metrics() -> str:
+    password_jobs_gauge.set((), password_jobs_pending)
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+# ============= Database Routing =============
+
+# Each route class gets its own client, so pool size and timeouts can be
+# tuned separately (MONGO_<CLASS>_MAX_POOL_SIZE, _MIN_POOL_SIZE,
+# _SERVER_SELECTION_TIMEOUT_MS, _CONNECT_TIMEOUT_MS, _SOCKET_TIMEOUT_MS,
+# _WAIT_QUEUE_TIMEOUT_MS). Writes and read-your-own-writes paths use the
+# primary client; catalog and analytics/export reads tolerate bounded
+# staleness and go to secondaries when the deployment has any.
+# To try it locally: mongod --replSet rs0, rs.initiate(), and
+# MONGO_URL=mongodb://localhost:27017/?replicaSet=rs0 (with one member every
+# read is served by the primary, which still exercises the routing).
+ROUTE_CLASSES = ("primary", "catalog", "analytics")
+SECONDARY_READ_PREFERENCE = os.environ.get('MONGO_SECONDARY_READ_PREFERENCE', 'secondaryPreferred')
+MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '90'))
+if MAX_STALENESS_SECONDS < 90:
+    # The server's floor: staleness below heartbeat + idle write period can't be judged
+    raise ValueError("MONGO_MAX_STALENESS_SECONDS must be at least 90")
+CLIENT_OPTION_ENV = {
+    "maxPoolSize": "MAX_POOL_SIZE",
+    "minPoolSize": "MIN_POOL_SIZE",
+    "serverSelectionTimeoutMS": "SERVER_SELECTION_TIMEOUT_MS",
+    "connectTimeoutMS": "CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "SOCKET_TIMEOUT_MS",
+    "waitQueueTimeoutMS": "WAIT_QUEUE_TIMEOUT_MS",
+}
+
+command_metrics = MongoCommandMetrics()
+
+def client_options(route_class: str) -> Dict[str, Any]:
+    # Timestamps are BSON dates; read them back as aware UTC datetimes
+    options: Dict[str, Any] = {"event_listeners": [command_metrics], "tz_aware": True}
+    for option, suffix in CLIENT_OPTION_ENV.items():
+        value = os.environ.get(f"MONGO_{route_class.upper()}_{suffix}")
+        if value:
+            options[option] = int(value)
+    if route_class != "primary" and SECONDARY_READ_PREFERENCE != "primary":
+        options["readPreference"] = SECONDARY_READ_PREFERENCE
+        options["maxStalenessSeconds"] = MAX_STALENESS_SECONDS
+    return options
+
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+clients = {route_class: AsyncIOMotorClient(mongo_url, **client_options(route_class)) for route_class in ROUTE_CLASSES}
+client = clients["primary"]
 db = client[os.environ['DB_NAME']]
+catalog_db = clients["catalog"][os.environ['DB_NAME']]
+analytics_db = clients["analytics"][os.environ['DB_NAME']]
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'rural-education-secret-key-2025')
@@ -28,10 +439,207 @@ JWT_EXPIRATION_HOURS = 24 * 7  # 1 week
 
 security = HTTPBearer()
 
+# Languages every localized {"punjabi", "hindi", "english"} field carries
+LANGUAGES = ('punjabi', 'hindi', 'english')
+Language = Literal['punjabi', 'hindi', 'english']
+
+# Attendance storage engine: 'documents' keeps one document per student per
+# day in attendance; 'bitmap' keeps one per (class, student, month) in
+# attendance_months with day bitmaps. Move data across with
+# migrate_attendance_bitmap.py.
+ATTENDANCE_STORE = os.environ.get('ATTENDANCE_STORE', 'documents')
+
+# Bulk grading
+MAX_GRADE_BATCH = int(os.environ.get('MAX_GRADE_BATCH', '500'))
+
+# Streaming exports: rows fetched and written per chunk
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# Offline progress sync
+MAX_PROGRESS_BATCH = int(os.environ.get('MAX_PROGRESS_BATCH', '500'))
+
+# Progress heartbeats are buffered in memory and written every few seconds,
+# or as soon as this many (student, lesson/module) keys are pending.
+PROGRESS_FLUSH_SECONDS = float(os.environ.get('PROGRESS_FLUSH_SECONDS', '5'))
+PROGRESS_BUFFER_MAX_ENTRIES = int(os.environ.get('PROGRESS_BUFFER_MAX_ENTRIES', '1000'))
+# Keys the buffer holds at most (e.g. while writes are failing); heartbeats for
+# new keys beyond this are refused with 503 until a flush drains it.
+PROGRESS_BUFFER_LIMIT = int(os.environ.get('PROGRESS_BUFFER_LIMIT', '20000'))
+
+# Response compression: brotli or gzip, negotiated from Accept-Encoding.
+# Responses smaller than the minimum size are sent uncompressed.
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get('COMPRESSION_MINIMUM_SIZE', '1000'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '4'))
+
+# Pagination
+DEFAULT_PAGE_LIMIT = 1000
+MAX_PAGE_LIMIT = 1000
+
+# Password hashing: bcrypt runs on a bounded worker pool, off the event loop
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '64'))
+
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+password_jobs_pending = 0
+
+# Authenticated-user cache
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+
+# ============= Response Encoding =============
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC)
+
+class MongoJSONResponse(ORJSONResponse):
+    """orjson response that also encodes BSON types found in Mongo documents."""
+
+    def render(self, content: Any) -> bytes:
+        start = time.perf_counter()
+        body = dumps_json(content)
+        request = current_request.get()
+        if request is not None:
+            request.encode_seconds += time.perf_counter() - start
+        return body
+
+def json_response(content: Any, response: Optional[Response] = None) -> MongoJSONResponse:
+    """Encode Mongo documents straight to JSON, skipping jsonable_encoder.
+
+    Headers already set on the route's injected ``response`` are carried over.
+    """
+    return MongoJSONResponse(content, headers=dict(response.headers) if response is not None else None)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values."""
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._br.process(data) if self.encoding == "br" else self._gz.compress(data)
+
+    def flush(self) -> bytes:
+        return self._br.flush() if self.encoding == "br" else self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._br.finish() if self.encoding == "br" else self._gz.flush()
+
+class CompressionMiddleware:
+    """Compress JSON/text responses with the client's preferred encoding.
+
+    Whole responses under ``minimum_size`` pass through untouched. Streaming
+    responses are compressed chunk by chunk and flushed as they go.
+    """
+
+    def __init__(self, app, minimum_size: int = 1000):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start["headers"])
+                compressible = (
+                    "content-encoding" not in headers
+                    and start["status"] not in (204, 304)
+                    and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                )
+                if not compressible or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+            data = compressor.compress(body)
+            data += compressor.flush() if more_body else compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=MongoJSONResponse)
 api_router = APIRouter(prefix="/api")
 
+# Lesson/module catalog cache. The version is bumped locally on catalog
+# writes; the TTL bounds staleness for other worker processes.
+CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', '512'))
+CATALOG_CACHE_TTL_SECONDS = float(os.environ.get('CATALOG_CACHE_TTL_SECONDS', '300'))
+
+# Concurrent identical reads share one in-flight call (per-call opt-in in code).
+SINGLE_FLIGHT_ENABLED = os.environ.get('SINGLE_FLIGHT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Lesson/module search index. Writes update it in place; other worker
+# processes pick them up on the next refresh.
+SEARCH_INDEX_REFRESH_SECONDS = float(os.environ.get('SEARCH_INDEX_REFRESH_SECONDS', '300'))
+MAX_SEARCH_RESULTS = 50
+
 # ============= Models =============
 
 class User(BaseModel):
@@ -119,6 +727,8 @@ class Submission(BaseModel):
     assignment_id: str
     student_id: str
     content: str
+    class_name: Optional[str] = None
+    school: Optional[str] = None
     marks: Optional[int] = None
     feedback: Optional[str] = None
     submitted_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -127,12 +737,20 @@ class SubmissionCreate(BaseModel):
     assignment_id: str
     content: str
 
+class GradeEntry(BaseModel):
+    submission_id: str
+    marks: int
+    feedback: Optional[str] = None
+
+class GradeBatch(BaseModel):
+    grades: List[GradeEntry] = Field(max_length=MAX_GRADE_BATCH)
+
 class Attendance(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     student_id: str
     class_name: str
-    date: str
+    date: datetime  # midnight UTC of the attendance day
     status: str  # 'present', 'absent'
     marked_by: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -158,14 +776,462 @@ class ProgressUpdate(BaseModel):
     completion_percentage: float
     time_spent: int
 
+class ProgressEvent(ProgressUpdate):
+    client_timestamp: datetime  # when the device recorded it; last writer wins
+
+class ProgressBatch(BaseModel):
+    events: List[ProgressEvent] = Field(max_length=MAX_PROGRESS_BATCH)
+
+# ============= User Cache =============
+
+class UserCache:
+    """Bounded LRU/TTL cache of token -> (decoded payload, user document).
+
+    Entries are indexed by user id as well so that a change to a user drops
+    every token cached for them.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tokens_by_user: Dict[str, set] = {}
+
+    def get(self, token: str) -> Optional[tuple]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, payload, user = entry
+        if expires_at <= time.monotonic():
+            self._remove(token)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return payload, dict(user)
+
+    def put(self, token: str, payload: Dict[str, Any], user: Dict[str, Any]):
+        if self.maxsize <= 0:
+            return
+        # Never hold a token past its own expiry.
+        ttl = min(self.ttl, payload['exp'] - time.time()) if 'exp' in payload else self.ttl
+        if token in self._entries:
+            self._remove(token)
+        self._entries[token] = (time.monotonic() + ttl, payload, dict(user))
+        self._tokens_by_user.setdefault(user['id'], set()).add(token)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: str):
+        for token in self._tokens_by_user.pop(user_id, set()):
+            self._entries.pop(token, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._tokens_by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, token: str):
+        _, _, user = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user['id'])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user['id']]
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
+# ============= Catalog Cache =============
+
+class CatalogEntry(NamedTuple):
+    version: int
+    stored_at: float
+    etag: str
+    body: Any
+    content: bytes  # body already encoded to JSON
+    headers: Dict[str, str]
+
+class CatalogCache:
+    """Versioned cache of catalog responses keyed by path and query string.
+
+    Every entry remembers the catalog version it was built from; bump() makes
+    all of them stale at once. Each entry carries a content ETag so clients can
+    revalidate with If-None-Match and get a bodyless 304.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self.bumped_at = float('-inf')
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, CatalogEntry]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[CatalogEntry]:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != self.version or entry.stored_at + self.ttl <= time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple, version: int, body: Any, headers: Dict[str, str]) -> CatalogEntry:
+        content = dumps_json(body)
+        digest = hashlib.sha1(content).hexdigest()
+        entry = CatalogEntry(version, time.monotonic(), f'"{digest}"', body, content, headers)
+        if self.maxsize > 0 and version == self.version:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def bump(self):
+        self.version += 1
+        self.bumped_at = time.monotonic()
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+catalog_cache = CatalogCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL_SECONDS)
+
+def catalog_database():
+    """Where catalog reads go: secondaries, except within the staleness bound
+    of this process's own catalog write, when a secondary may not have it yet
+    and the response would be cached until the next bump."""
+    if time.monotonic() - catalog_cache.bumped_at < MAX_STALENESS_SECONDS:
+        return db
+    return catalog_db
+
+# ============= Request Coalescing =============
+
+single_flight_calls = Metric("single_flight_calls_total",
+                             "Reads through the single-flight layer, by whether they ran the call or shared one.",
+                             "counter", ("call", "role"))
+single_flight_in_flight = Metric("single_flight_in_flight", "Distinct single-flight calls currently running.",
+                                 "gauge", ("call",))
+
+class SingleFlight:
+    """Lets concurrent identical reads share one in-flight call.
+
+    The first caller for a key runs ``fn()`` as a task; callers arriving
+    before it finishes await that task instead of querying again. The key is
+    dropped as soon as the call finishes, so nothing is cached here. The task
+    is shielded, so a leader whose client goes away doesn't cancel it for the
+    others. Every caller gets the same result object: don't mutate it.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls: Dict[tuple, asyncio.Task] = {}
+
+    async def do(self, call: str, key: tuple, fn):
+        if not self.enabled:
+            return await fn()
+        flight = (call, key)
+        task = self._calls.get(flight)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[flight] = task
+            task.add_done_callback(lambda done: self._land(flight, done))
+            single_flight_in_flight.inc((call,))
+            self.leaders += 1
+            single_flight_calls.inc((call, "leader"))
+        else:
+            self.coalesced += 1
+            single_flight_calls.inc((call, "coalesced"))
+        return await asyncio.shield(task)
+
+    def _land(self, flight: tuple, task: asyncio.Task):
+        if self._calls.get(flight) is task:
+            del self._calls[flight]
+        single_flight_in_flight.inc((flight[0],), -1)
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every waiter went away
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / calls if calls else 0.0,
+        }
+
+single_flight = SingleFlight(SINGLE_FLIGHT_ENABLED)
+
+# ============= Search Index =============
+
+# Runs of Latin letters/digits, Devanagari or Gurmukhi. Vowel signs and
+# virama are combining marks (not \w), so the scripts are spelled out by
+# block; the danda and double danda (U+0964/5) end a sentence, not a word.
+TOKEN_RE = re.compile(r"[0-9a-z\u00c0-\u024f]+|[\u0900-\u0963\u0966-\u097f\u0a00-\u0a7f]+")
+# Joiners only change glyph shaping and would otherwise split or fork words.
+_JOINERS = dict.fromkeys(map(ord, "\u200c\u200d"), None)
+SEARCH_FIELD_WEIGHTS = {"title": 3.0, "description": 2.0, "content": 1.0}
+FUZZY_MAX_EXPANSIONS = 5
+# Terms in more than this share of documents are skipped when the query has rarer ones
+COMMON_TERM_RATIO = 0.5
+SEARCH_REBUILD_BATCH = 500
+
+def search_tokens(text: str) -> List[str]:
+    text = unicodedata.normalize('NFC', text).translate(_JOINERS).casefold()
+    return TOKEN_RE.findall(text)
+
+def search_text(value: Any) -> List[str]:
+    """All strings in a localized field, whatever its nesting."""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, list):
+        return []
+    return [text for item in value for text in search_text(item)]
+
+def bigrams(term: str) -> set:
+    padded = f" {term} "
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+def max_typos(term: str) -> int:
+    """Edits tolerated in a misspelled term. Counted in code points, so a
+    missing vowel sign or addak in a short Indic word is one edit."""
+    if len(term) < 3:
+        return 0
+    return 1 if len(term) < 6 else 2
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance with adjacent transpositions counted as one edit
+    (optimal string alignment), or ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+class SearchIndex:
+    """In-process inverted index over lesson and module text in every language.
+
+    Postings map a term to {doc key: weight}. Query terms missing from the
+    vocabulary are matched to known terms within a few edits (candidates
+    found by bigram overlap), so a misspelling still finds the lesson.
+    """
+
+    def __init__(self):
+        self.built_at = 0.0
+        self._reset()
+        self._rebuilding = False
+        self._pending: List[tuple] = []
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[tuple, float]] = {}
+        self._doc_terms: Dict[tuple, List[str]] = {}
+        self._docs: Dict[tuple, Dict[str, Any]] = {}
+        self._grams: Dict[str, set] = {}
+
+    def add(self, kind: str, doc: Dict[str, Any]):
+        if self._rebuilding:
+            self._pending.append((kind, doc))
+        self._index(kind, doc)
+
+    def _index(self, kind: str, doc: Dict[str, Any]):
+        key = (kind, doc['id'])
+        self.remove(key)
+        weights: Dict[str, float] = {}
+        for field, weight in SEARCH_FIELD_WEIGHTS.items():
+            counts = Counter(term for text in search_text(doc.get(field)) for term in search_tokens(text))
+            for term, count in counts.items():
+                weights[term] = weights.get(term, 0.0) + weight * count
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                for gram in bigrams(term):
+                    self._grams.setdefault(gram, set()).add(term)
+            postings[key] = weight
+        self._doc_terms[key] = list(weights)
+        self._docs[key] = {
+            "type": kind, "id": doc['id'], "title": doc.get('title', {}),
+            **{f: doc[f] for f in ("subject", "grade", "category", "level") if f in doc}
+        }
+
+    def _index_many(self, kind: str, docs: List[Dict[str, Any]]):
+        for doc in docs:
+            self._index(kind, doc)
+
+    def remove(self, key: tuple):
+        for term in self._doc_terms.pop(key, ()):
+            postings = self._postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+                for gram in bigrams(term):
+                    self._grams[gram].discard(term)
+        self._docs.pop(key, None)
+
+    async def rebuild(self):
+        """Reload from the database and swap in the new index. Documents added
+        while the reload was reading are re-applied afterwards."""
+        if self._rebuilding:
+            return
+        self._rebuilding = True
+        fresh = SearchIndex()
+        try:
+            fields = {"_id": 0, "id": 1, "title": 1, "description": 1, "content": 1}
+            sources = [
+                ("lesson", catalog_database().lessons, {**fields, "subject": 1, "grade": 1}),
+                ("digital_literacy", catalog_database().digital_literacy_modules, {**fields, "category": 1, "level": 1}),
+            ]
+            for kind, collection, projection in sources:
+                cursor = collection.find({}, projection).batch_size(SEARCH_REBUILD_BATCH)
+                while batch := await cursor.to_list(SEARCH_REBUILD_BATCH):
+                    # Tokenizing is CPU-bound; keep the event loop serving requests.
+                    await asyncio.to_thread(fresh._index_many, kind, batch)
+            for kind, doc in self._pending:
+                fresh._index(kind, doc)
+            self._postings, self._doc_terms = fresh._postings, fresh._doc_terms
+            self._docs, self._grams = fresh._docs, fresh._grams
+            self.built_at = time.monotonic()
+        finally:
+            self._pending = []
+            self._rebuilding = False
+
+    def is_stale(self) -> bool:
+        return not self._rebuilding and self.built_at + SEARCH_INDEX_REFRESH_SECONDS <= time.monotonic()
+
+    def _expand(self, term: str) -> List[tuple]:
+        """(known term, similarity) pairs a query term matches."""
+        if term in self._postings:
+            return [(term, 1.0)]
+        limit = max_typos(term)
+        if not limit:
+            return []
+        grams = bigrams(term)
+        # An edit breaks at most three bigrams (a transposition), so a term
+        # within ``limit`` edits shares at least this many with the query term.
+        needed = max(1, len(grams) - 3 * limit)
+        shared = Counter(t for gram in grams for t in self._grams.get(gram, ()))
+        matches = []
+        for candidate, count in shared.items():
+            if count < needed:
+                continue
+            distance = edit_distance(term, candidate, limit)
+            if distance <= limit:
+                matches.append((candidate, 1 - distance / max(len(term), len(candidate))))
+        return heapq.nlargest(FUZZY_MAX_EXPANSIONS, matches, key=lambda match: match[1])
+
+    def search(self, query: str, kind: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        scores: Dict[tuple, float] = {}
+        total = len(self._docs)
+        matches = [match for term in dict.fromkeys(search_tokens(query)) for match in self._expand(term)]
+        rare = [m for m in matches if len(self._postings[m[0]]) <= total * COMMON_TERM_RATIO]
+        if not rare and matches:
+            # Nothing but near-stopwords: the least common one ranks as well as all of them.
+            rare = [min(matches, key=lambda m: len(self._postings[m[0]]))]
+        for match, similarity in rare:
+            postings = self._postings[match]
+            # Rare terms say more about a document than ones in every lesson.
+            boost = similarity * math.log(1 + total / len(postings))
+            for key, weight in postings.items():
+                if kind is None or key[0] == kind:
+                    scores[key] = scores.get(key, 0.0) + weight * boost
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [{**self._docs[key], "score": round(score, 3)} for key, score in ranked]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"documents": len(self._docs), "terms": len(self._postings), "rebuilding": self._rebuilding}
+
+search_index = SearchIndex()
+
+def refresh_search_index() -> asyncio.Task:
+    """Start a background rebuild of the search index unless one is already
+    running, and return its task. A failed rebuild is logged and retried by
+    the next search that finds the index stale."""
+    task = getattr(app.state, 'search_index_task', None)
+    if task is None or task.done():
+        task = app.state.search_index_task = asyncio.create_task(search_index.rebuild())
+        task.add_done_callback(_log_search_index_rebuild)
+    return task
+
+def _log_search_index_rebuild(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Search index rebuild failed", exc_info=task.exception())
+
 # ============= Helper Functions =============
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+def password_needs_rehash(hashed: str) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt+digest>
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+async def run_password_job(fn, *args):
+    """Run a bcrypt call on the password pool, rejecting fast when saturated."""
+    global password_jobs_pending
+    if password_jobs_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please try again",
+            headers={"Retry-After": "1"}
+        )
+    password_jobs_pending += 1
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, fn, *args)
+    finally:
+        password_jobs_pending -= 1
+        request = current_request.get()
+        if request is not None:
+            request.password_seconds += time.perf_counter() - start
+
+async def hash_password_async(password: str) -> str:
+    return await run_password_job(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await run_password_job(verify_password, password, hashed)
+
 def create_token(user_id: str, email: str, role: str) -> str:
     expiration = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     payload = {
@@ -187,10 +1253,14 @@ def verify_token(token: str) -> Dict[str, Any]:
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached[1]
     payload = verify_token(token)
     user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    user_cache.put(token, payload, user)
     return user
 
 async def get_current_teacher(user: dict = Depends(get_current_user)):
@@ -203,6 +1273,802 @@ async def get_current_admin(user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Not authorized. Admins only.")
     return user
 
+# ============= Indexes =============
+
+# Every index the routes below rely on, per collection. Keep this in sync with
+# QUERY_PATTERNS: a new query shape needs an index declared here. List queries
+# are paginated on _id, so their indexes end in _id to serve the sort. That
+# only holds when every key before _id is matched by equality, so a list that
+# filters on a prefix alone (e.g. a class's whole attendance history) gets
+# its own (prefix, _id) index rather than sharing one with a date key.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING), ("class_name", ASCENDING), ("_id", ASCENDING)], name="role_class_id"),
+        IndexModel([("role", ASCENDING), ("school", ASCENDING)], name="role_school"),
+        IndexModel([("role", ASCENDING), ("_id", ASCENDING)], name="role_id"),
+    ],
+    "lessons": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("subject", ASCENDING), ("grade", ASCENDING), ("_id", ASCENDING)], name="subject_grade_id"),
+        IndexModel([("language", ASCENDING), ("_id", ASCENDING)], name="language_id"),
+        IndexModel([("grade", ASCENDING), ("_id", ASCENDING)], name="grade_id"),
+        IndexModel([("_seq", ASCENDING)], name="seq"),
+    ],
+    "digital_literacy_modules": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("category", ASCENDING), ("level", ASCENDING), ("_id", ASCENDING)], name="category_level_id"),
+        IndexModel([("level", ASCENDING), ("_id", ASCENDING)], name="level_id"),
+        IndexModel([("_seq", ASCENDING)], name="seq"),
+    ],
+    "assignments": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("class_name", ASCENDING), ("_id", ASCENDING)], name="class_name_id"),
+        IndexModel([("teacher_id", ASCENDING), ("_id", ASCENDING)], name="teacher_id_id"),
+        IndexModel([("class_name", ASCENDING), ("_seq", ASCENDING)], name="class_name_seq"),
+        IndexModel([("teacher_id", ASCENDING), ("_seq", ASCENDING)], name="teacher_id_seq"),
+        IndexModel([("_seq", ASCENDING)], name="seq"),
+        IndexModel([("class_name", ASCENDING), ("due_date", ASCENDING)], name="class_name_due_date"),
+        IndexModel([("teacher_id", ASCENDING), ("due_date", ASCENDING)], name="teacher_id_due_date"),
+        IndexModel([("due_date", ASCENDING)], name="due_date"),
+    ],
+    "submissions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("student_id", ASCENDING), ("assignment_id", ASCENDING), ("_id", ASCENDING)], name="student_assignment_id"),
+        IndexModel([("assignment_id", ASCENDING), ("_id", ASCENDING)], name="assignment_id_id"),
+        IndexModel([("student_id", ASCENDING), ("submitted_at", ASCENDING)], name="student_submitted_at"),
+        IndexModel([("submitted_at", ASCENDING)], name="submitted_at"),
+        IndexModel([("student_id", ASCENDING), ("_id", ASCENDING)], name="student_id_id"),
+    ],
+    "attendance": [
+        IndexModel([("student_id", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)], name="student_date_id"),
+        IndexModel([("class_name", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)], name="class_date_id"),
+        IndexModel([("date", ASCENDING), ("_id", ASCENDING)], name="date_id"),
+        IndexModel([("class_name", ASCENDING), ("_id", ASCENDING)], name="class_name_id"),
+        IndexModel([("student_id", ASCENDING), ("_id", ASCENDING)], name="student_id_id"),
+        IndexModel([("student_id", ASCENDING), ("class_name", ASCENDING), ("date", ASCENDING)],
+                   name="student_class_date_unique", unique=True),
+    ],
+    "attendance_months": [
+        IndexModel([("class_name", ASCENDING), ("month", ASCENDING), ("student_id", ASCENDING)],
+                   name="class_month_student_unique", unique=True),
+        IndexModel([("student_id", ASCENDING), ("month", ASCENDING), ("_id", ASCENDING)], name="student_month_id"),
+        IndexModel([("class_name", ASCENDING), ("_id", ASCENDING)], name="class_name_id"),
+        IndexModel([("student_id", ASCENDING), ("_id", ASCENDING)], name="student_id_id"),
+    ],
+    "progress": [
+        IndexModel([("student_id", ASCENDING), ("lesson_id", ASCENDING), ("module_id", ASCENDING)],
+                   name="student_lesson_module_unique", unique=True),
+        IndexModel([("student_id", ASCENDING), ("_id", ASCENDING)], name="student_id_id"),
+        IndexModel([("student_id", ASCENDING), ("_seq", ASCENDING)], name="student_id_seq"),
+        IndexModel([("student_id", ASCENDING), ("last_accessed", ASCENDING)], name="student_last_accessed"),
+    ],
+    "tombstones": [
+        IndexModel([("collection", ASCENDING), ("_seq", ASCENDING)], name="collection_seq"),
+    ],
+    "analytics_rollups": [
+        IndexModel([("scope", ASCENDING), ("key", ASCENDING)], name="scope_key_unique", unique=True),
+    ],
+}
+
+# (route, collection, filter fields) for every filtered query the routes issue.
+# Unfiltered listings (e.g. an admin reading all assignments) are left out.
+QUERY_PATTERNS = [
+    ("get_current_user", "users", ("id",)),
+    ("register", "users", ("email",)),
+    ("login", "users", ("email",)),
+    ("get_students", "users", ("role",)),
+    ("get_students", "users", ("role", "class_name")),
+    ("get_class_analytics", "users", ("class_name", "role")),
+    ("get_class_analytics", "analytics_rollups", ("scope", "key")),
+    ("mark_attendance", "users", ("id",)),
+    ("mark_attendance", "attendance", ("class_name", "date")),
+    ("mark_attendance", "attendance", ("student_id", "class_name", "date")),
+    ("mark_attendance", "attendance_months", ("class_name", "month", "student_id")),
+    ("get_attendance", "attendance_months", ("student_id",)),
+    ("get_attendance", "attendance_months", ("class_name",)),
+    ("get_attendance", "attendance_months", ("class_name", "month")),
+    ("get_attendance", "attendance_months", ("student_id", "class_name", "month")),
+    ("get_attendance_summary", "attendance", ("class_name", "date")),
+    ("get_attendance_summary", "attendance", ("student_id", "class_name", "date")),
+    ("get_attendance_summary", "attendance_months", ("class_name", "month")),
+    ("get_attendance_summary", "attendance_months", ("student_id", "class_name", "month")),
+    ("attendance_counts", "attendance_months", ("student_id",)),
+    ("export_student_ids", "users", ("role", "class_name")),
+    ("export_student_ids", "users", ("role", "school")),
+    ("export_records", "attendance", ("class_name", "date")),
+    ("export_records", "attendance", ("student_id", "date")),
+    ("export_records", "attendance_months", ("class_name", "month")),
+    ("export_records", "attendance_months", ("student_id", "month")),
+    ("export_records", "submissions", ("student_id",)),
+    ("export_records", "progress", ("student_id",)),
+    ("class_analytics_pipeline", "users", ("class_name", "role")),
+    ("sync_changes", "lessons", ("_seq",)),
+    ("sync_changes", "digital_literacy_modules", ("_seq",)),
+    ("sync_changes", "assignments", ("_seq",)),
+    ("sync_changes", "assignments", ("class_name", "_seq")),
+    ("sync_changes", "assignments", ("teacher_id", "_seq")),
+    ("sync_changes", "progress", ("student_id", "_seq")),
+    ("sync_changes", "tombstones", ("collection", "_seq")),
+    ("get_lessons", "lessons", ("language",)),
+    ("get_lessons", "lessons", ("subject",)),
+    ("get_lessons", "lessons", ("grade",)),
+    ("get_lessons", "lessons", ("subject", "grade")),
+    ("get_lessons", "lessons", ("language", "subject", "grade")),
+    ("get_lesson", "lessons", ("id",)),
+    ("get_digital_literacy_modules", "digital_literacy_modules", ("category",)),
+    ("get_digital_literacy_modules", "digital_literacy_modules", ("level",)),
+    ("get_digital_literacy_modules", "digital_literacy_modules", ("category", "level")),
+    ("get_digital_literacy_module", "digital_literacy_modules", ("id",)),
+    ("get_assignments", "assignments", ("class_name",)),
+    ("get_assignments", "assignments", ("teacher_id",)),
+    ("get_assignments", "assignments", ("class_name", "due_date")),
+    ("get_assignments", "assignments", ("teacher_id", "due_date")),
+    ("get_assignments", "assignments", ("due_date",)),
+    ("get_submissions", "submissions", ("student_id",)),
+    ("submission_scope", "assignments", ("teacher_id",)),
+    ("get_submissions", "submissions", ("assignment_id",)),
+    ("get_submissions", "submissions", ("student_id", "assignment_id")),
+    ("get_submissions", "submissions", ("student_id", "submitted_at")),
+    ("get_submissions", "submissions", ("submitted_at",)),
+    ("export_records", "submissions", ("submitted_at",)),
+    ("grade_submission", "submissions", ("id",)),
+    ("grade_submissions", "submissions", ("id",)),
+    ("submission_rollup_targets", "users", ("id",)),
+    ("get_attendance", "attendance", ("student_id",)),
+    ("get_attendance", "attendance", ("class_name",)),
+    ("get_attendance", "attendance", ("date",)),
+    ("get_attendance", "attendance", ("class_name", "date")),
+    ("get_attendance", "attendance", ("student_id", "class_name", "date")),
+    ("class_analytics_pipeline", "attendance", ("student_id",)),
+    ("update_progress", "progress", ("student_id", "lesson_id", "module_id")),
+    ("sync_progress_batch", "progress", ("student_id", "lesson_id", "module_id")),
+    ("get_progress", "progress", ("student_id",)),
+    ("get_progress", "progress", ("student_id", "last_accessed")),
+    ("class_analytics_pipeline", "submissions", ("student_id",)),
+    ("class_analytics_pipeline", "progress", ("student_id",)),
+]
+
+def index_covers(keys: List[str], fields) -> bool:
+    """True if the index can serve an equality match on ``fields``.
+
+    The index is usable when its leading key is filtered on, and it fully
+    covers the filter when every filtered field sits in its key prefix.
+    A trailing _id is the pagination sort key, not a filter field.
+    """
+    keys = [k for k in keys if k != "_id"]
+    fields = set(fields)
+    prefix = keys[:len(fields)]
+    return set(prefix) == fields or (bool(keys) and set(keys) <= fields)
+
+def find_uncovered_queries() -> List[tuple]:
+    uncovered = []
+    for route, collection, fields in QUERY_PATTERNS:
+        keys = [[k for k, _ in model.document["key"].items()] for model in INDEXES.get(collection, [])]
+        if not any(index_covers(k, fields) for k in keys):
+            uncovered.append((route, collection, fields))
+    return uncovered
+
+# Unique indexes that data written by older code can violate: before one is
+# first built, duplicates are removed, keeping the first document per key in
+# this order (the newest).
+DEDUPE_BEFORE_INDEX = {
+    ("progress", "student_lesson_module_unique"): [("client_timestamp", -1), ("last_accessed", -1), ("_id", -1)],
+    # Re-marks before the upsert were separate inserts: the last one is current
+    ("attendance", "student_class_date_unique"): [("created_at", -1), ("_id", -1)],
+}
+
+# (collection, index name) built by ensure_indexes() in this process
+ready_indexes: set = set()
+
+def require_index(collection: str, name: str):
+    """Refuse a write whose correctness depends on a unique index that isn't built."""
+    if (collection, name) not in ready_indexes:
+        raise HTTPException(status_code=503, detail=f"Unavailable until the {collection} index {name} is built")
+
+async def dedupe(collection: str, key_fields: List[str], keep_sort: List[tuple]) -> int:
+    """Delete all but the first document, in ``keep_sort`` order, per key.
+    Deletions from a synced collection are recorded as tombstones first, so
+    devices holding the removed documents drop them on their next /sync."""
+    pipeline = [
+        {"$sort": dict(keep_sort)},
+        # Missing and null are the same key to a unique index
+        {"$group": {"_id": {f: {"$ifNull": [f"${f}", None]} for f in key_fields},
+                    "keep": {"$first": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    removed = 0
+    async for group in db[collection].aggregate(pipeline, allowDiskUse=True):
+        duplicates = {**group['_id'], "_id": {"$ne": group['keep']}}
+        if collection in SYNC_COLLECTIONS.values():
+            await record_tombstones(collection, duplicates)
+        result = await db[collection].delete_many(duplicates)
+        removed += result.deleted_count
+    return removed
+
+async def ensure_indexes():
+    for route, collection, fields in find_uncovered_queries():
+        logger.warning("No index covers %s query on %s%s", route, collection, list(fields))
+
+    deduped = 0
+    for collection, models in INDEXES.items():
+        try:
+            existing = await db[collection].index_information()
+            for model in models:
+                name = model.document["name"]
+                keep_sort = DEDUPE_BEFORE_INDEX.get((collection, name))
+                if keep_sort and name not in existing:
+                    removed = await dedupe(collection, list(model.document["key"]), keep_sort)
+                    if removed:
+                        logger.warning("Removed %d duplicate %s documents before building %s", removed, collection, name)
+                    deduped += removed
+            names = await db[collection].create_indexes(models)
+            ready_indexes.update((collection, name) for name in names)
+            logger.info("Indexes ready on %s: %s", collection, ", ".join(names))
+        except Exception as e:
+            # Keep serving; writes that need a missing unique index refuse themselves.
+            logger.error("Index creation failed on %s: %s", collection, e)
+
+    if deduped and await rollups_ready():
+        # The removed duplicates were counted in the rollups
+        await rebuild_rollups()
+
+# ============= Pagination =============
+
+def encode_cursor(oid: ObjectId) -> str:
+    return base64.urlsafe_b64encode(oid.binary).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def find_page(collection, query: Dict[str, Any], projection: Dict[str, Any],
+                    limit: int, after: Optional[str], response: Response,
+                    newest_first: bool = False) -> List[Dict[str, Any]]:
+    """Return one keyset page of ``query`` ordered by _id (descending with
+    ``newest_first``).
+
+    When more documents follow, the cursor for the next page is sent in the
+    X-Next-Cursor header and can be passed back as ``after``.
+    """
+    if after:
+        query = {**query, "_id": {"$lt" if newest_first else "$gt": decode_cursor(after)}}
+    projection = {k: v for k, v in projection.items() if k != "_id"} or None
+    direction = DESCENDING if newest_first else ASCENDING
+    docs = await collection.find(query, projection).sort("_id", direction).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1]["_id"])
+    for doc in docs:
+        doc.pop("_id", None)
+    return docs
+
+def parse_timestamp(value: str, name: str) -> datetime:
+    """ISO 8601 date or datetime; naive values are taken as UTC."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 date or datetime")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def time_range(from_: Optional[str], to: Optional[str]) -> Optional[Dict[str, datetime]]:
+    """Mongo range for ``from``/``to`` list filters, both inclusive. A bare
+    date as ``to`` includes the whole day."""
+    bounds = {}
+    if from_:
+        bounds['$gte'] = parse_timestamp(from_, "from")
+    if to:
+        end = parse_timestamp(to, "to")
+        if len(to) == 10:  # YYYY-MM-DD
+            bounds['$lt'] = end + timedelta(days=1)
+        else:
+            bounds['$lte'] = end
+    return bounds or None
+
+def in_time_range(value: datetime, bounds: Optional[Dict[str, datetime]]) -> bool:
+    """Whether ``value`` satisfies a time_range() filter."""
+    checks = {'$gte': value.__ge__, '$lt': value.__lt__, '$lte': value.__le__}
+    return all(checks[op](bound) for op, bound in (bounds or {}).items())
+
+# ============= Analytics Rollups =============
+
+# Running counters kept per student, class and school in analytics_rollups.
+# The write routes $inc them so class analytics is a single document read;
+# rebuild_rollups() recomputes them from the raw collections.
+ROLLUP_COUNTERS = (
+    "attendance_records",
+    "present_records",
+    "total_submissions",
+    "graded_submissions",
+    "marks_sum",
+    "progress_records",
+    "completion_sum",
+)
+
+# Written to counters once rebuild_rollups() has backfilled every rollup.
+# Until then the $inc'd rollups only hold changes made since the deploy, so
+# analytics keeps aggregating the raw collections.
+ROLLUPS_MARKER = "rollups_built"
+rollups_built = False  # cached once seen; the marker is never removed
+
+async def rollups_ready() -> bool:
+    global rollups_built
+    if not rollups_built:
+        rollups_built = await analytics_db.counters.find_one({"_id": ROLLUPS_MARKER}) is not None
+    return rollups_built
+
+def rollup_targets(student_id: str, class_name: Optional[str], school: Optional[str]) -> List[tuple]:
+    targets = [("student", student_id), ("class", class_name), ("school", school)]
+    return [(scope, key) for scope, key in targets if key]
+
+def rollup_update(scope: str, key: str, inc: Dict[str, Any]) -> UpdateOne:
+    return UpdateOne(
+        {"scope": scope, "key": key},
+        {"$inc": inc, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+async def bump_rollups(updates: Dict[tuple, Dict[str, Any]]):
+    """Apply {(scope, key): {counter: delta}} in one unordered bulk write."""
+    ops = [rollup_update(scope, key, inc) for (scope, key), inc in updates.items() if any(inc.values())]
+    if ops:
+        await db.analytics_rollups.bulk_write(ops, ordered=False)
+
+def add_rollup_delta(updates: Dict[tuple, Dict[str, Any]], targets: List[tuple], inc: Dict[str, Any]):
+    for target in targets:
+        counters = updates.setdefault(target, {})
+        for name, delta in inc.items():
+            counters[name] = counters.get(name, 0) + delta
+
+def rollup_stats(counters: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn raw rollup counters into the stats shape analytics returns."""
+    c = {name: counters.get(name, 0) for name in ROLLUP_COUNTERS}
+    return {
+        "attendance_records": c["attendance_records"],
+        "present_records": c["present_records"],
+        "attendance_rate": c["present_records"] / c["attendance_records"] if c["attendance_records"] else 0,
+        "total_submissions": c["total_submissions"],
+        "graded_submissions": c["graded_submissions"],
+        "ungraded_submissions": c["total_submissions"] - c["graded_submissions"],
+        "avg_marks": c["marks_sum"] / c["graded_submissions"] if c["graded_submissions"] else 0,
+        "progress_records": c["progress_records"],
+        "avg_progress": c["completion_sum"] / c["progress_records"] if c["progress_records"] else 0,
+    }
+
+async def compute_rollups() -> Dict[tuple, Dict[str, Any]]:
+    """Recompute every rollup from the raw collections.
+
+    Counts are grouped per student in Mongo and folded into class and school
+    totals here. Class and school follow the same rules as the write paths:
+    attendance uses the class it was marked for, submissions use the class
+    stored on the submission, and progress uses the student's current class.
+    """
+    students = {}
+    async for u in db.users.find({"role": "student"}, {"_id": 0, "id": 1, "class_name": 1, "school": 1}):
+        students[u['id']] = u
+
+    computed: Dict[tuple, Dict[str, Any]] = {}
+
+    def fold(student_id, class_name, school, inc):
+        add_rollup_delta(computed, rollup_targets(student_id, class_name, school), inc)
+
+    for row in await attendance_counts():
+        student_id = row['student_id']
+        school = students.get(student_id, {}).get('school')
+        fold(student_id, row.get('class_name'), school,
+             {"attendance_records": row['records'], "present_records": row['present']})
+
+    submissions = db.submissions.aggregate([
+        {"$group": {
+            "_id": {"student_id": "$student_id", "class_name": "$class_name", "school": "$school"},
+            "records": {"$sum": 1},
+            "graded": {"$sum": {"$cond": [{"$ne": [{"$ifNull": ["$marks", None]}, None]}, 1, 0]}},
+            "marks_sum": {"$sum": {"$ifNull": ["$marks", 0]}}
+        }}
+    ])
+    async for row in submissions:
+        student_id = row['_id']['student_id']
+        student = students.get(student_id, {})
+        fold(student_id,
+             row['_id'].get('class_name') or student.get('class_name'),
+             row['_id'].get('school') or student.get('school'),
+             {"total_submissions": row['records'], "graded_submissions": row['graded'], "marks_sum": row['marks_sum']})
+
+    progress = db.progress.aggregate([
+        {"$group": {
+            "_id": "$student_id",
+            "records": {"$sum": 1},
+            "completion_sum": {"$sum": {"$ifNull": ["$completion_percentage", 0]}}
+        }}
+    ])
+    async for row in progress:
+        student = students.get(row['_id'], {})
+        fold(row['_id'], student.get('class_name'), student.get('school'),
+             {"progress_records": row['records'], "completion_sum": row['completion_sum']})
+
+    return computed
+
+async def rebuild_rollups(check_only: bool = False) -> Dict[str, Any]:
+    """Recompute all rollups, report drift against the stored ones and,
+    unless ``check_only``, replace the stored ones with the fresh values."""
+    global rollups_built
+    computed = await compute_rollups()
+    stored = {}
+    async for doc in db.analytics_rollups.find({}, {"_id": 0}):
+        stored[(doc['scope'], doc['key'])] = doc
+
+    mismatches = []
+    for target in set(computed) | set(stored):
+        fresh = computed.get(target, {})
+        current = stored.get(target, {})
+        diff = {
+            name: {"stored": current.get(name, 0), "computed": fresh.get(name, 0)}
+            for name in ROLLUP_COUNTERS
+            if abs(current.get(name, 0) - fresh.get(name, 0)) > 1e-6
+        }
+        if diff:
+            mismatches.append({"scope": target[0], "key": target[1], "counters": diff})
+
+    if not check_only:
+        now = datetime.now(timezone.utc)
+        ops = [
+            ReplaceOne(
+                {"scope": scope, "key": key},
+                {"scope": scope, "key": key, **{name: counters.get(name, 0) for name in ROLLUP_COUNTERS}, "updated_at": now},
+                upsert=True
+            )
+            for (scope, key), counters in computed.items()
+        ]
+        if ops:
+            await db.analytics_rollups.bulk_write(ops, ordered=False)
+        stale = [target for target in stored if target not in computed]
+        for scope, key in stale:
+            await db.analytics_rollups.delete_one({"scope": scope, "key": key})
+        await db.counters.update_one({"_id": ROLLUPS_MARKER}, {"$set": {"built_at": now}}, upsert=True)
+        rollups_built = True
+
+    return {
+        "rollups": len(computed),
+        "mismatches": mismatches,
+        "rebuilt": not check_only
+    }
+
+# ============= Catalog Projections =============
+
+# Localized fields and what view=summary leaves out, per catalog collection
+LESSON_LOCALIZED_FIELDS = ("title", "description", "content")
+LESSON_SUMMARY_EXCLUDES = ("content",)
+MODULE_LOCALIZED_FIELDS = ("title", "description")
+MODULE_SUMMARY_EXCLUDES = ("content", "exercises")
+
+def catalog_projection(localized_fields, lang: Optional[str] = None,
+                       summary_excludes=(), summary: bool = False) -> Dict[str, Any]:
+    """Mongo projection that keeps only ``lang`` in localized fields and,
+    for summaries, drops the heavy fields entirely."""
+    projection = {"_id": 0}
+    excluded = set(summary_excludes) if summary else set()
+    for field in excluded:
+        projection[field] = 0
+    if lang:
+        for field in localized_fields:
+            if field in excluded:
+                continue
+            for other in LANGUAGES:
+                if other != lang:
+                    projection[f"{field}.{other}"] = 0
+    return projection
+
+# ============= Conditional GET =============
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison: W/"x" and "x" are the same validator for GET.
+    candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return etag in candidates
+
+async def catalog_response(request: Request, load, coalesce_as: Optional[str] = None) -> Response:
+    """Serve a catalog read through catalog_cache, answering 304 when the
+    client's ETag still matches.
+
+    There is no Last-Modified: the cache's version is per process, so a
+    worker that hasn't seen a change would keep confirming a stale date.
+    The ETag is a hash of the body, which holds across workers.
+
+    ``load(page_response)`` fetches the body on a miss. Headers it sets on
+    ``page_response`` (e.g. X-Next-Cursor) are cached with the body. With
+    ``coalesce_as``, concurrent misses for the same key share one load.
+    """
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    
+    async def fill() -> CatalogEntry:
+        version = catalog_cache.version
+        page = Response()
+        body = await load(page)
+        return catalog_cache.put(key, version, body, {
+            name: value for name, value in page.headers.items() if name.lower().startswith('x-')
+        })
+    
+    entry = catalog_cache.get(key)
+    if entry is None:
+        entry = await (single_flight.do(coalesce_as, key, fill) if coalesce_as else fill())
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None and etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    # Served from the bytes encoded once when the entry was cached
+    return Response(content=entry.content, media_type="application/json", headers=headers)
+
+# ============= Attendance Bitmap Store =============
+
+# In attendance_months, bit (day - 1) of ``marked`` says the student's
+# attendance was taken that day and the same bit of ``present`` says they were
+# present; absent days are marked & ~present.
+
+def parse_attendance_date(value: str) -> Date:
+    try:
+        return Date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Attendance dates must be YYYY-MM-DD")
+
+def day_start(day: Date) -> datetime:
+    """Attendance days are stored as BSON dates at midnight UTC."""
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+def month_key(day: Date) -> str:
+    return day.strftime('%Y-%m')
+
+def attendance_out(record: Dict[str, Any]) -> Dict[str, Any]:
+    """API shape of an attendance record: the day as YYYY-MM-DD, as it was
+    before days were stored as dates."""
+    return {**record, "date": record['date'].date().isoformat()}
+
+def day_bit(day: Date) -> int:
+    return 1 << (day.day - 1)
+
+def day_range_mask(first_day: int, last_day: int) -> int:
+    """Bits for days first_day..last_day (1-based, inclusive) of a month."""
+    return ((1 << last_day) - 1) & ~((1 << (first_day - 1)) - 1)
+
+def month_range_mask(month: str, start: Date, end: Date) -> int:
+    """Bits of ``month`` (YYYY-MM) for the days that fall within start..end."""
+    first = start.day if month == month_key(start) else 1
+    last = end.day if month == month_key(end) else 31
+    return day_range_mask(first, last)
+
+def bitmap_status(doc: Optional[Dict[str, Any]], bit: int) -> Optional[str]:
+    if not doc or not doc.get('marked', 0) & bit:
+        return None
+    return 'present' if doc.get('present', 0) & bit else 'absent'
+
+def bitmap_attendance_op(class_name: str, student_id: str, day: Date, status_value: str) -> UpdateOne:
+    bit = day_bit(day)
+    present = {"or": bit} if status_value == 'present' else {"and": ~bit}
+    return UpdateOne(
+        {"class_name": class_name, "month": month_key(day), "student_id": student_id},
+        {"$bit": {"marked": {"or": bit}, "present": present},
+         "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+def expand_attendance_month(doc: Dict[str, Any], only_day: Optional[Date] = None) -> List[Dict[str, Any]]:
+    """Per-day attendance records, in the documents store's shape, for one month document."""
+    year, month = (int(part) for part in doc['month'].split('-'))
+    records = []
+    marked = doc.get('marked', 0)
+    for day in range(1, 32):
+        bit = 1 << (day - 1)
+        if not marked & bit or (only_day is not None and only_day.day != day):
+            continue
+        records.append({
+            "student_id": doc['student_id'],
+            "class_name": doc['class_name'],
+            "date": day_start(Date(year, month, day)),
+            "status": 'present' if doc.get('present', 0) & bit else 'absent'
+        })
+    return records
+
+async def attendance_counts(student_ids: Optional[List[str]] = None, database=None) -> List[Dict[str, Any]]:
+    """(student_id, class_name) -> records/present counts from whichever store is active."""
+    database = database if database is not None else db
+    if ATTENDANCE_STORE == 'bitmap':
+        match = {"student_id": {"$in": student_ids}} if student_ids is not None else {}
+        counts: Dict[tuple, Dict[str, Any]] = {}
+        async for doc in database.attendance_months.find(match, {"_id": 0, "student_id": 1, "class_name": 1, "marked": 1, "present": 1}):
+            row = counts.setdefault((doc['student_id'], doc['class_name']), {
+                "student_id": doc['student_id'], "class_name": doc['class_name'], "records": 0, "present": 0
+            })
+            row['records'] += doc.get('marked', 0).bit_count()
+            row['present'] += (doc.get('present', 0) & doc.get('marked', 0)).bit_count()
+        return list(counts.values())
+    
+    pipeline = [{"$match": {"student_id": {"$in": student_ids}}}] if student_ids is not None else []
+    pipeline.append({"$group": {
+        "_id": {"student_id": "$student_id", "class_name": "$class_name"},
+        "records": {"$sum": 1},
+        "present": {"$sum": {"$cond": [{"$eq": ["$status", "present"]}, 1, 0]}}
+    }})
+    rows = await database.attendance.aggregate(pipeline).to_list(None)
+    return [{**row['_id'], "records": row['records'], "present": row['present']} for row in rows]
+
+# ============= Change Tracking =============
+
+# Collections offline clients sync, under the name they appear in /sync.
+SYNC_COLLECTIONS = {
+    "lessons": "lessons",
+    "digital_literacy": "digital_literacy_modules",
+    "assignments": "assignments",
+    "progress": "progress",
+}
+# Fields copied onto tombstones so deletions can be scoped like live documents
+TOMBSTONE_SCOPE_FIELDS = ("class_name", "teacher_id", "student_id")
+# Change sequences are reserved from the shared counter SYNC_SEQ_BATCH at a
+# time, so a write normally takes one without a round trip. Each reserved
+# range is leased in the counter document with the lowest sequence that may
+# still be written from it, and /sync never hands out a token at or past the
+# lowest live lease. Leases are refreshed every SYNC_LEASE_REFRESH_SECONDS;
+# one left behind by a process that died stops holding the token back after
+# SYNC_PENDING_TIMEOUT_SECONDS.
+SYNC_SEQ_BATCH = int(os.environ.get('SYNC_SEQ_BATCH', '100'))
+SYNC_LEASE_REFRESH_SECONDS = float(os.environ.get('SYNC_LEASE_REFRESH_SECONDS', '1'))
+SYNC_PENDING_TIMEOUT_SECONDS = float(os.environ.get('SYNC_PENDING_TIMEOUT_SECONDS', '60'))
+
+class SyncSequence:
+    """This process's share of the global change sequence.
+
+    Every write to a synced collection stamps its documents with a sequence
+    in _seq, so a sync token is simply the highest sequence a client has
+    seen. A sequence is pending from allocate() until settle() (sync_write()
+    does both); publish() moves each lease up to its lowest pending sequence.
+    An idle process gives up the rest of its range at the next publish, so
+    it doesn't hold back other writers' changes.
+    """
+
+    def __init__(self, batch: int, refresh: float):
+        self.batch = batch
+        self.refresh = refresh
+        self.reservations = 0
+        self._owner = uuid.uuid4().hex
+        self._generation = 0
+        self._lease: Optional[str] = None  # lease of the range being allocated from
+        self._next = self._end = 0  # its unallocated part, [next, end)
+        self._ranges: Dict[str, tuple] = {}  # every lease still held -> (start, end)
+        self._pending: set = set()
+        self._reserving = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def allocate(self) -> int:
+        while self._next >= self._end:
+            async with self._reserving:
+                if self._next >= self._end:
+                    await self._reserve()
+        seq = self._next
+        self._next += 1
+        self._pending.add(seq)
+        return seq
+
+    def settle(self, seq: int):
+        self._pending.discard(seq)
+
+    async def _reserve(self):
+        self._generation += 1
+        lease = f"{self._owner}-{self._generation}"
+        counter = await db.counters.find_one_and_update(
+            {"_id": "sync_seq"},
+            # One stage, so both expressions read the value before the update:
+            # the lease starts at the first sequence of the new range.
+            [{"$set": {
+                "value": {"$add": [{"$ifNull": ["$value", 0]}, self.batch]},
+                f"leases.{lease}": {"low": {"$add": [{"$ifNull": ["$value", 0]}, 1]},
+                                    "at": datetime.now(timezone.utc)},
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._end = counter['value'] + 1
+        self._next = self._end - self.batch
+        self._lease = lease
+        self._ranges[lease] = (self._next, self._end)
+        self.reservations += 1
+
+    async def publish(self):
+        """Write each lease's current low to the counter document, dropping
+        leases with nothing pending and nothing left to allocate."""
+        if self._lease and not any(s >= self._ranges[self._lease][0] for s in self._pending):
+            self._lease, self._next = None, self._end
+        now = datetime.now(timezone.utc)
+        update: Dict[str, Dict[str, Any]] = {}
+        for lease, (start, end) in list(self._ranges.items()):
+            waiting = [s for s in self._pending if start <= s < end]
+            if lease == self._lease and self._next < end:
+                waiting.append(self._next)
+            if waiting:
+                update.setdefault("$set", {})[f"leases.{lease}"] = {"low": min(waiting), "at": now}
+            else:
+                update.setdefault("$unset", {})[f"leases.{lease}"] = ""
+                del self._ranges[lease]
+        if update:
+            await db.counters.update_one({"_id": "sync_seq"}, update)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh)
+            try:
+                await self.publish()
+            except Exception:
+                logger.exception("Refreshing sync sequence leases failed")
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop refreshing and give up the rest of the current range."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._lease, self._next = None, self._end
+        await self.publish()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batch": self.batch,
+            "reservations": self.reservations,
+            "pending": len(self._pending),
+            "leases": len(self._ranges),
+            "unallocated": self._end - self._next,
+        }
+
+sync_sequence = SyncSequence(SYNC_SEQ_BATCH, SYNC_LEASE_REFRESH_SECONDS)
+
+@asynccontextmanager
+async def sync_write():
+    """Allocate a sequence for the write in the block, pending until it exits."""
+    seq = await sync_sequence.allocate()
+    try:
+        yield seq
+    finally:
+        sync_sequence.settle(seq)
+
+async def current_sync_seq() -> int:
+    """The highest sequence at or below which every allocated write has landed."""
+    counter = await db.counters.find_one({"_id": "sync_seq"})
+    if not counter:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=SYNC_PENDING_TIMEOUT_SECONDS)
+    live = []
+    for lease, held in counter.get('leases', {}).items():
+        if held['at'] > cutoff:
+            live.append(held['low'])
+        else:
+            # Only if it wasn't refreshed since this read
+            await db.counters.update_one({"_id": "sync_seq", f"leases.{lease}.at": {"$lte": cutoff}},
+                                         {"$unset": {f"leases.{lease}": ""}})
+    return min(live) - 1 if live else counter['value']
+
+def change_stamp(seq: int) -> Dict[str, Any]:
+    return {"_seq": seq, "updated_at": datetime.now(timezone.utc)}
+
+async def stamp_unsynced(collection: str) -> int:
+    """Stamp documents written without change tracking (e.g. by seed_data.py)."""
+    async with sync_write() as seq:
+        result = await db[collection].update_many({"_seq": {"$exists": False}}, {"$set": change_stamp(seq)})
+    return result.modified_count
+
+async def record_tombstones(collection: str, query: Dict[str, Any]):
+    """Remember the documents matching ``query`` as deleted, before deleting them."""
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in TOMBSTONE_SCOPE_FIELDS}}
+    docs = await db[collection].find(query, projection).to_list(None)
+    if not docs:
+        return
+    now = datetime.now(timezone.utc)
+    async with sync_write() as seq:
+        await db.tombstones.insert_many([
+            {"collection": collection, **doc, "_seq": seq, "deleted_at": now} for doc in docs
+        ], ordered=False)
+
 # ============= Auth Routes =============
 
 @api_router.post("/auth/register")
@@ -213,16 +2079,20 @@ async def register(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash password
-    hashed_pw = hash_password(user_data.password)
+    hashed_pw = await hash_password_async(user_data.password)
     
     # Create user
     user_dict = user_data.model_dump(exclude={'password'})
     user = User(**user_dict)
     doc = user.model_dump()
     doc['password'] = hashed_pw
-    doc['created_at'] = doc['created_at'].isoformat()
     
-    await db.users.insert_one(doc)
+    try:
+        await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        # A concurrent registration with the same email won the unique index
+        raise HTTPException(status_code=400, detail="Email already registered")
+    user_cache.invalidate_user(user.id)
     
     # Create token
     token = create_token(user.id, user.email, user.role)
@@ -235,9 +2105,19 @@ async def register(user_data: UserCreate):
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user['password']):
+    if not user or not await verify_password_async(credentials.password, user['password']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Upgrade hashes made with an old cost factor while we have the password
+    if password_needs_rehash(user['password']):
+        try:
+            new_hash = await hash_password_async(credentials.password)
+        except HTTPException:
+            new_hash = None  # pool saturated; try again on a later login
+        if new_hash:
+            await db.users.update_one({"id": user['id']}, {"$set": {"password": new_hash}})
+            user_cache.invalidate_user(user['id'])
+    
     token = create_token(user['id'], user['email'], user['role'])
     user.pop('password', None)
     
@@ -254,7 +2134,9 @@ async def get_me(user: dict = Depends(get_current_user)):
 # ============= Lesson Routes =============
 
 @api_router.get("/lessons")
-async def get_lessons(language: Optional[str] = None, subject: Optional[str] = None, grade: Optional[str] = None):
+async def get_lessons(request: Request, language: Optional[str] = None, subject: Optional[str] = None, grade: Optional[str] = None,
+                      lang: Optional[Language] = None, view: Literal['full', 'summary'] = 'full',
+                      limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT), after: Optional[str] = None):
     query = {}
     if language:
         query['language'] = language
@@ -263,213 +2145,1015 @@ async def get_lessons(language: Optional[str] = None, subject: Optional[str] = N
     if grade:
         query['grade'] = grade
     
-    lessons = await db.lessons.find(query, {"_id": 0}).to_list(1000)
-    return lessons
+    projection = catalog_projection(LESSON_LOCALIZED_FIELDS, lang, LESSON_SUMMARY_EXCLUDES, view == 'summary')
+    
+    async def load(page: Response):
+        return await find_page(catalog_database().lessons, query, projection, limit, after, page)
+    
+    return await catalog_response(request, load, coalesce_as="lessons")
 
 @api_router.get("/lessons/{lesson_id}")
-async def get_lesson(lesson_id: str):
-    lesson = await db.lessons.find_one({"id": lesson_id}, {"_id": 0})
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found")
-    return lesson
+async def get_lesson(lesson_id: str, request: Request, lang: Optional[Language] = None):
+    projection = catalog_projection(LESSON_LOCALIZED_FIELDS, lang)
+    
+    async def load(page: Response):
+        lesson = await catalog_database().lessons.find_one({"id": lesson_id}, projection)
+        if not lesson:
+            raise HTTPException(status_code=404, detail="Lesson not found")
+        return lesson
+    
+    return await catalog_response(request, load, coalesce_as="lesson")
 
 @api_router.post("/lessons")
 async def create_lesson(lesson_data: LessonCreate, user: dict = Depends(get_current_teacher)):
     lesson_dict = lesson_data.model_dump()
     lesson = Lesson(**lesson_dict, created_by=user['id'])
     doc = lesson.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    
-    await db.lessons.insert_one(doc)
+    async with sync_write() as seq:
+        doc.update(change_stamp(seq))
+        await db.lessons.insert_one(doc)
+    catalog_cache.bump()
+    search_index.add("lesson", doc)
     return lesson
 
+@api_router.get("/search")
+async def search_catalog(q: str = Query(..., min_length=1, max_length=200),
+                         type: Optional[Literal['lesson', 'digital_literacy']] = None,
+                         lang: Optional[Language] = None,
+                         limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS)):
+    if search_index.is_stale():
+        refresh_search_index()
+    results = search_index.search(q, type, limit)
+    if lang:
+        for result in results:
+            result['title'] = {lang: result['title'].get(lang)}
+    return json_response(results)
+
 # ============= Digital Literacy Routes =============
 
 @api_router.get("/digital-literacy")
-async def get_digital_literacy_modules(category: Optional[str] = None, level: Optional[str] = None):
+async def get_digital_literacy_modules(request: Request, category: Optional[str] = None, level: Optional[str] = None,
+                                       lang: Optional[Language] = None, view: Literal['full', 'summary'] = 'full',
+                                       limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT), after: Optional[str] = None):
     query = {}
     if category:
         query['category'] = category
     if level:
         query['level'] = level
     
-    modules = await db.digital_literacy_modules.find(query, {"_id": 0}).to_list(1000)
-    return modules
+    projection = catalog_projection(MODULE_LOCALIZED_FIELDS, lang, MODULE_SUMMARY_EXCLUDES, view == 'summary')
+    
+    async def load(page: Response):
+        return await find_page(catalog_database().digital_literacy_modules, query, projection, limit, after, page)
+    
+    return await catalog_response(request, load, coalesce_as="digital_literacy")
 
 @api_router.get("/digital-literacy/{module_id}")
-async def get_digital_literacy_module(module_id: str):
-    module = await db.digital_literacy_modules.find_one({"id": module_id}, {"_id": 0})
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
-    return module
+async def get_digital_literacy_module(module_id: str, request: Request, lang: Optional[Language] = None):
+    projection = catalog_projection(MODULE_LOCALIZED_FIELDS, lang)
+    
+    async def load(page: Response):
+        module = await catalog_database().digital_literacy_modules.find_one({"id": module_id}, projection)
+        if not module:
+            raise HTTPException(status_code=404, detail="Module not found")
+        return module
+    
+    return await catalog_response(request, load, coalesce_as="digital_literacy_module")
 
 # ============= Assignment Routes =============
 
 @api_router.get("/assignments")
-async def get_assignments(user: dict = Depends(get_current_user)):
+async def get_assignments(response: Response, from_: Optional[str] = Query(None, alias="from"), to: Optional[str] = None,
+                          limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT), after: Optional[str] = None,
+                          user: dict = Depends(get_current_user)):
+    """Assignments visible to the user; ``from``/``to`` filter on due_date."""
     query = {}
     if user['role'] == 'student':
         query['class_name'] = user.get('class_name')
     elif user['role'] == 'teacher':
         query['teacher_id'] = user['id']
+    due = time_range(from_, to)
+    if due:
+        query['due_date'] = due
     
-    assignments = await db.assignments.find(query, {"_id": 0}).to_list(1000)
-    return assignments
+    assignments = await find_page(db.assignments, query, {"_id": 0}, limit, after, response)
+    return json_response(assignments, response)
 
 @api_router.post("/assignments")
 async def create_assignment(assignment_data: AssignmentCreate, user: dict = Depends(get_current_teacher)):
     assignment_dict = assignment_data.model_dump()
-    assignment_dict['due_date'] = datetime.fromisoformat(assignment_data.due_date)
+    assignment_dict['due_date'] = parse_timestamp(assignment_data.due_date, "due_date")
     assignment = Assignment(**assignment_dict, teacher_id=user['id'])
     doc = assignment.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['due_date'] = doc['due_date'].isoformat()
-    
-    await db.assignments.insert_one(doc)
+    async with sync_write() as seq:
+        doc.update(change_stamp(seq))
+        await db.assignments.insert_one(doc)
     return assignment
 
 # ============= Submission Routes =============
 
-@api_router.get("/submissions")
-async def get_submissions(assignment_id: Optional[str] = None, user: dict = Depends(get_current_user)):
-    query = {}
-    if user['role'] == 'student':
-        query['student_id'] = user['id']
+async def submission_scope(user: dict, assignment_id: Optional[str] = None) -> Dict[str, Any]:
+    """Students see their own submissions, teachers those for their own
+    assignments, admins everything."""
+    if user['role'] == 'teacher':
+        assignment_ids = await db.assignments.distinct("id", {"teacher_id": user['id']})
+        if assignment_id:
+            assignment_ids = [a for a in assignment_ids if a == assignment_id]
+        return {"assignment_id": {"$in": assignment_ids}}
+    query = {"student_id": user['id']} if user['role'] == 'student' else {}
     if assignment_id:
         query['assignment_id'] = assignment_id
+    return query
+
+@api_router.get("/submissions")
+async def get_submissions(response: Response, assignment_id: Optional[str] = None,
+                          from_: Optional[str] = Query(None, alias="from"), to: Optional[str] = None,
+                          order: Literal['oldest', 'newest'] = 'oldest',
+                          limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT), after: Optional[str] = None,
+                          user: dict = Depends(get_current_user)):
+    """``from``/``to`` filter on submitted_at. Pass the same ``order`` with
+    every page of a cursor."""
+    query = await submission_scope(user, assignment_id)
+    submitted = time_range(from_, to)
+    if submitted:
+        query['submitted_at'] = submitted
     
-    submissions = await db.submissions.find(query, {"_id": 0}).to_list(1000)
-    return submissions
+    submissions = await find_page(db.submissions, query, {"_id": 0}, limit, after, response,
+                                  newest_first=order == 'newest')
+    return json_response(submissions, response)
 
 @api_router.post("/submissions")
 async def create_submission(submission_data: SubmissionCreate, user: dict = Depends(get_current_user)):
     if user['role'] != 'student':
         raise HTTPException(status_code=403, detail="Only students can submit assignments")
     
-    submission = Submission(**submission_data.model_dump(), student_id=user['id'])
+    submission = Submission(
+        **submission_data.model_dump(),
+        student_id=user['id'],
+        class_name=user.get('class_name'),
+        school=user.get('school')
+    )
     doc = submission.model_dump()
-    doc['submitted_at'] = doc['submitted_at'].isoformat()
     
     await db.submissions.insert_one(doc)
+    await bump_rollups({
+        target: {"total_submissions": 1}
+        for target in rollup_targets(user['id'], submission.class_name, submission.school)
+    })
     return submission
 
+def grading_delta(old_marks: Optional[int], new_marks: int) -> Dict[str, Any]:
+    return {
+        "graded_submissions": 1 if old_marks is None else 0,
+        "marks_sum": new_marks - (old_marks or 0)
+    }
+
+async def submission_rollup_targets(submissions: List[Dict[str, Any]]) -> List[List[tuple]]:
+    """Rollup targets for each submission, in order."""
+    # Submissions made before rollups existed don't carry class/school;
+    # look their students up in one query.
+    missing = {s['student_id'] for s in submissions if not s.get('class_name') or not s.get('school')}
+    students = {}
+    if missing:
+        async for student in db.users.find(
+            {"id": {"$in": list(missing)}}, {"_id": 0, "id": 1, "class_name": 1, "school": 1}
+        ):
+            students[student['id']] = student
+    targets = []
+    for submission in submissions:
+        student = students.get(submission['student_id'], {})
+        targets.append(rollup_targets(
+            submission['student_id'],
+            submission.get('class_name') or student.get('class_name'),
+            submission.get('school') or student.get('school')
+        ))
+    return targets
+
 @api_router.put("/submissions/{submission_id}/grade")
 async def grade_submission(submission_id: str, marks: int, feedback: Optional[str] = None, user: dict = Depends(get_current_teacher)):
-    result = await db.submissions.update_one(
+    before = await db.submissions.find_one_and_update(
         {"id": submission_id},
-        {"$set": {"marks": marks, "feedback": feedback}}
+        {"$set": {"marks": marks, "feedback": feedback}},
+        projection={"_id": 0, "student_id": 1, "class_name": 1, "school": 1, "marks": 1},
+        return_document=ReturnDocument.BEFORE
     )
-    if result.modified_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="Submission not found")
+    
+    updates = {}
+    [targets] = await submission_rollup_targets([before])
+    add_rollup_delta(updates, targets, grading_delta(before.get('marks'), marks))
+    await bump_rollups(updates)
     return {"message": "Graded successfully"}
 
+@api_router.put("/submissions/grades")
+async def grade_submissions(batch: GradeBatch, user: dict = Depends(get_current_teacher)):
+    """Grade many submissions in one request and one bulk_write.
+
+    Returns a result per submission; unknown ids are reported as not_found
+    rather than failing the batch.
+    """
+    # Last entry wins if a submission is graded twice in one batch
+    grades = {g.submission_id: g for g in batch.grades}
+    before = {}
+    async for doc in db.submissions.find(
+        {"id": {"$in": list(grades)}},
+        {"_id": 0, "id": 1, "student_id": 1, "class_name": 1, "school": 1, "marks": 1}
+    ):
+        before[doc['id']] = doc
+    
+    ops = [
+        UpdateOne({"id": submission_id}, {"$set": {"marks": grade.marks, "feedback": grade.feedback}})
+        for submission_id, grade in grades.items() if submission_id in before
+    ]
+    if ops:
+        await db.submissions.bulk_write(ops, ordered=False)
+    
+    # Deltas come from the pre-read; a concurrent regrade of the same
+    # submission can skew them until rebuild_rollups().
+    found = [before[submission_id] for submission_id in grades if submission_id in before]
+    updates = {}
+    for doc, targets in zip(found, await submission_rollup_targets(found)):
+        add_rollup_delta(updates, targets, grading_delta(doc.get('marks'), grades[doc['id']].marks))
+    await bump_rollups(updates)
+    
+    results = [
+        {"submission_id": submission_id, "status": "graded" if submission_id in before else "not_found"}
+        for submission_id in grades
+    ]
+    return {"graded": len(found), "not_found": len(grades) - len(found), "results": results}
+
 # ============= Attendance Routes =============
 
-@api_router.post("/attendance")
-async def mark_attendance(attendance_data: AttendanceCreate, user: dict = Depends(get_current_teacher)):
-    records = []
-    for student_data in attendance_data.students:
+async def bulk_upsert(collection, ops: List[UpdateOne]) -> tuple:
+    """Unordered bulk upsert returning (inserted, modified).
+
+    Two writers upserting the same new key race on the unique index; the
+    loser's ops are retried once, when they match the winner's document.
+    """
+    inserted = modified = 0
+    for attempt in range(2):
+        try:
+            result = await collection.bulk_write(ops, ordered=False)
+            return inserted + result.upserted_count, modified + result.modified_count
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if attempt or any(error.get('code') != 11000 for error in errors):
+                raise
+            inserted += e.details.get('nUpserted', 0)
+            modified += e.details.get('nModified', 0)
+            ops = [ops[error['index']] for error in errors]
+    return inserted, modified
+
+async def write_attendance_documents(attendance_data: AttendanceCreate, statuses: Dict[str, str], user: dict) -> tuple:
+    day = day_start(parse_attendance_date(attendance_data.date))
+    previous = {}
+    async for doc in db.attendance.find(
+        {"class_name": attendance_data.class_name, "date": day,
+         "student_id": {"$in": list(statuses)}},
+        {"_id": 0, "student_id": 1, "status": 1}
+    ):
+        previous[doc['student_id']] = doc['status']
+    
+    ops = []
+    for student_id, status_value in statuses.items():
         attendance = Attendance(
-            student_id=student_data['student_id'],
+            student_id=student_id,
             class_name=attendance_data.class_name,
-            date=attendance_data.date,
-            status=student_data['status'],
+            date=day,
+            status=status_value,
             marked_by=user['id']
         )
-        doc = attendance.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
-        records.append(doc)
+        ops.append(UpdateOne(
+            {"student_id": student_id, "class_name": attendance.class_name, "date": attendance.date},
+            {"$set": {"status": attendance.status, "marked_by": attendance.marked_by},
+             "$setOnInsert": {"id": attendance.id, "created_at": attendance.created_at}},
+            upsert=True
+        ))
+    inserted, updated = await bulk_upsert(db.attendance, ops)
+    return previous, inserted, updated
+
+async def write_attendance_bitmap(attendance_data: AttendanceCreate, statuses: Dict[str, str]) -> tuple:
+    day = parse_attendance_date(attendance_data.date)
+    bit = day_bit(day)
+    previous = {}
+    async for doc in db.attendance_months.find(
+        {"class_name": attendance_data.class_name, "month": month_key(day),
+         "student_id": {"$in": list(statuses)}},
+        {"_id": 0, "student_id": 1, "marked": 1, "present": 1}
+    ):
+        status_value = bitmap_status(doc, bit)
+        if status_value:
+            previous[doc['student_id']] = status_value
+    
+    ops = [
+        bitmap_attendance_op(attendance_data.class_name, student_id, day, status_value)
+        for student_id, status_value in statuses.items()
+    ]
+    await bulk_upsert(db.attendance_months, ops)
+    # A month document holds many days, so per-day changes come from the pre-read.
+    inserted = sum(1 for student_id in statuses if student_id not in previous)
+    updated = sum(1 for student_id, value in statuses.items() if previous.get(student_id, value) != value)
+    return previous, inserted, updated
+
+@api_router.post("/attendance")
+async def mark_attendance(attendance_data: AttendanceCreate, user: dict = Depends(get_current_teacher)):
+    """Record a class's attendance for a day.
+
+    Idempotent: each (student, class, date) is upserted, so re-sending the
+    same roll call after a dropped connection changes nothing.
+    """
+    # Last entry wins if a student appears twice in one submission
+    statuses = {s['student_id']: s['status'] for s in attendance_data.students}
+    if not statuses:
+        return {"message": "0 attendance records marked", "inserted": 0, "updated": 0, "unchanged": 0}
+    
+    if ATTENDANCE_STORE == 'bitmap':
+        previous, inserted, updated = await write_attendance_bitmap(attendance_data, statuses)
+    else:
+        previous, inserted, updated = await write_attendance_documents(attendance_data, statuses, user)
+    
+    # Rollup deltas come from the pre-read of previous statuses; two teachers
+    # re-sending the same roll call at the same moment can skew them until
+    # rebuild_rollups().
+    schools = {}
+    async for student in db.users.find({"id": {"$in": list(statuses)}}, {"_id": 0, "id": 1, "school": 1}):
+        schools[student['id']] = student.get('school')
+    updates = {}
+    for student_id, status_value in statuses.items():
+        was_present = previous.get(student_id) == 'present'
+        inc = {"present_records": int(status_value == 'present') - int(was_present)}
+        if student_id not in previous:
+            inc["attendance_records"] = 1
+        add_rollup_delta(
+            updates,
+            rollup_targets(student_id, attendance_data.class_name, schools.get(student_id)),
+            inc
+        )
+    await bump_rollups(updates)
     
-    if records:
-        await db.attendance.insert_many(records)
-    return {"message": f"{len(records)} attendance records marked"}
+    return {
+        "message": f"{len(statuses)} attendance records marked",
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": len(statuses) - inserted - updated
+    }
 
 @api_router.get("/attendance")
-async def get_attendance(class_name: Optional[str] = None, date: Optional[str] = None, user: dict = Depends(get_current_user)):
+async def get_attendance(response: Response, class_name: Optional[str] = None, date: Optional[str] = None,
+                         from_: Optional[str] = Query(None, alias="from"), to: Optional[str] = None,
+                         limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT), after: Optional[str] = None,
+                         user: dict = Depends(get_current_user)):
+    """Attendance records for one ``date`` (YYYY-MM-DD) or a ``from``/``to``
+    range, which takes dates or datetimes like the other list filters."""
     query = {}
     if user['role'] == 'student':
         query['student_id'] = user['id']
     if class_name:
         query['class_name'] = class_name
-    if date:
-        query['date'] = date
+    day = parse_attendance_date(date) if date else None
+    days = None if day else time_range(from_, to)
+    
+    if ATTENDANCE_STORE == 'bitmap':
+        # Pages here count (student, month) documents, each expanded to its days.
+        if day:
+            query['month'] = month_key(day)
+            query['marked'] = {"$bitsAllSet": day_bit(day)}
+        elif days:
+            query['month'] = {
+                "$gte" if op == '$gte' else "$lte": month_key(bound.astimezone(timezone.utc))
+                for op, bound in days.items()
+            }
+        months = await find_page(db.attendance_months, query, {"_id": 0}, limit, after, response)
+        attendance = [
+            attendance_out(record) for doc in months for record in expand_attendance_month(doc, day)
+            if in_time_range(record['date'], days)
+        ]
+        return json_response(attendance, response)
+    
+    if day:
+        query['date'] = day_start(day)
+    elif days:
+        query['date'] = days
+    attendance = await find_page(db.attendance, query, {"_id": 0}, limit, after, response)
+    return json_response([attendance_out(record) for record in attendance], response)
+
+@api_router.get("/attendance/summary")
+async def get_attendance_summary(class_name: str, from_date: str, to_date: str,
+                                 user: dict = Depends(get_current_user)):
+    """Per-student and class attendance percentages over a date range, e.g. a month or a term.
+
+    Read from the analytics client, so it may trail the latest roll call by
+    up to MONGO_MAX_STALENESS_SECONDS.
+    """
+    start, end = parse_attendance_date(from_date), parse_attendance_date(to_date)
+    if end < start:
+        raise HTTPException(status_code=400, detail="to_date is before from_date")
+    query = {"class_name": class_name}
+    if user['role'] == 'student':
+        query['student_id'] = user['id']
     
-    attendance = await db.attendance.find(query, {"_id": 0}).to_list(1000)
-    return attendance
+    counts: Dict[str, List[int]] = {}
+    if ATTENDANCE_STORE == 'bitmap':
+        query['month'] = {"$gte": month_key(start), "$lte": month_key(end)}
+        async for doc in analytics_db.attendance_months.find(query, {"_id": 0, "student_id": 1, "month": 1, "marked": 1, "present": 1}):
+            marked = doc.get('marked', 0) & month_range_mask(doc['month'], start, end)
+            row = counts.setdefault(doc['student_id'], [0, 0])
+            row[0] += marked.bit_count()
+            row[1] += (doc.get('present', 0) & marked).bit_count()
+    else:
+        query['date'] = {"$gte": day_start(start), "$lte": day_start(end)}
+        async for row in analytics_db.attendance.aggregate([
+            {"$match": query},
+            {"$group": {
+                "_id": "$student_id",
+                "marked": {"$sum": 1},
+                "present": {"$sum": {"$cond": [{"$eq": ["$status", "present"]}, 1, 0]}}
+            }}
+        ]):
+            counts[row['_id']] = [row['marked'], row['present']]
+    
+    students = [
+        {"student_id": student_id, "marked_days": marked, "present_days": present,
+         "attendance_rate": present / marked if marked else 0}
+        for student_id, (marked, present) in counts.items()
+    ]
+    marked_total = sum(s['marked_days'] for s in students)
+    present_total = sum(s['present_days'] for s in students)
+    return json_response({
+        "class_name": class_name,
+        "from_date": start.isoformat(),
+        "to_date": end.isoformat(),
+        "marked_days": marked_total,
+        "present_days": present_total,
+        "attendance_rate": present_total / marked_total if marked_total else 0,
+        "students": students
+    })
 
 # ============= Progress Routes =============
 
+def progress_key(student_id: str, lesson_id: Optional[str], module_id: Optional[str]) -> Dict[str, Any]:
+    # Both ids are part of the unique key; the one not in use is stored as null.
+    return {"student_id": student_id, "lesson_id": lesson_id or None, "module_id": module_id or None}
+
+def progress_upsert(progress_data: ProgressUpdate, client_timestamp: datetime, seq: int,
+                    last_accessed: Optional[datetime] = None) -> Dict[str, Any]:
+    return {
+        "$set": {
+            **change_stamp(seq),
+            "completion_percentage": progress_data.completion_percentage,
+            "time_spent": progress_data.time_spent,
+            "last_accessed": last_accessed or datetime.now(timezone.utc),
+            # BSON dates keep milliseconds; truncate so stored and compared values agree
+            "client_timestamp": client_timestamp.astimezone(timezone.utc).replace(
+                microsecond=client_timestamp.microsecond // 1000 * 1000
+            )
+        },
+        "$setOnInsert": {"id": str(uuid.uuid4())}
+    }
+
+def progress_rollup_delta(before: Optional[Dict[str, Any]], completion_percentage: float) -> Dict[str, Any]:
+    if before is None:
+        return {"progress_records": 1, "completion_sum": completion_percentage}
+    return {"completion_sum": completion_percentage - before.get('completion_percentage', 0)}
+
+async def write_progress(entries: List[tuple]) -> set:
+    """Upsert ``(key, update, rollup_targets)`` entries with one bulk_write and
+    bump rollups for the ones applied.
+
+    An update only overwrites stored progress that is not newer than it (last
+    writer wins by client_timestamp). Returns the indexes of stale entries.
+    """
+    # Without the unique index a stale entry inserts a second document
+    # instead of failing, and would be reported as applied.
+    require_index("progress", "student_lesson_module_unique")
+    before = {}
+    async for doc in db.progress.find(
+        {"$or": [key for key, _, _ in entries]},
+        {"_id": 0, "student_id": 1, "lesson_id": 1, "module_id": 1, "completion_percentage": 1}
+    ):
+        before[(doc['student_id'], doc.get('lesson_id'), doc.get('module_id'))] = doc
+    
+    ops = []
+    for key, update, _ in entries:
+        stamp = update["$set"]["client_timestamp"]
+        ops.append(UpdateOne(
+            {**key,
+             # String timestamps predate the BSON date migration; treat them as older
+             "$or": [{"client_timestamp": {"$lte": stamp}}, {"client_timestamp": {"$exists": False}},
+                     {"client_timestamp": {"$type": "string"}}]},
+            update,
+            upsert=True
+        ))
+    
+    # A newer stored document fails the timestamp filter, so the upsert tries
+    # to insert a second copy and trips the unique index: that entry is stale.
+    stale = set()
+    try:
+        await db.progress.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get('writeErrors', []):
+            if error.get('code') != 11000:
+                raise
+            stale.add(error['index'])
+    
+    updates = {}
+    for i, (key, update, targets) in enumerate(entries):
+        if i not in stale:
+            add_rollup_delta(updates, targets, progress_rollup_delta(
+                before.get((key['student_id'], key['lesson_id'], key['module_id'])),
+                update["$set"]["completion_percentage"]
+            ))
+    await bump_rollups(updates)
+    return stale
+
+progress_buffer_rejected = Metric("progress_buffer_rejected_total",
+                                  "Heartbeats refused because the progress buffer was full.", "counter", ())
+
+class ProgressBuffer:
+    """Write-behind buffer for progress heartbeats.
+
+    Updates are coalesced per (student, lesson/module), newest wins, and
+    written with write_progress() every ``interval`` seconds or once
+    ``max_entries`` keys are pending. Entries stay visible to pending()
+    until their write completes; a failed write puts them back. At most
+    ``limit`` keys are held: put() refuses new ones beyond that.
+    """
+
+    def __init__(self, interval: float, max_entries: int, limit: int):
+        self.interval = interval
+        self.max_entries = max_entries
+        self.limit = limit
+        self.flushes = 0
+        self.written = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.rejected = 0
+        self._pending: Dict[tuple, Dict[str, Any]] = {}
+        self._flushing: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_tasks: set = set()
+
+    def put(self, user: dict, progress_data: ProgressUpdate) -> bool:
+        """Buffer a heartbeat; False if the buffer is full."""
+        key = progress_key(user['id'], progress_data.lesson_id, progress_data.module_id)
+        ident = tuple(key.values())
+        if ident in self._pending:
+            self.coalesced += 1
+        elif len(self._pending) + len(self._flushing) >= self.limit:
+            self.rejected += 1
+            progress_buffer_rejected.inc(())
+            return False
+        now = datetime.now(timezone.utc)
+        self._pending[ident] = {
+            "key": key,
+            "data": progress_data,
+            "at": now,
+            "targets": rollup_targets(user['id'], user.get('class_name'), user.get('school')),
+        }
+        if len(self._pending) >= self.max_entries and not self._flush_tasks and not self._lock.locked():
+            self._start_flush()
+        return True
+
+    def discard(self, key: Dict[str, Any]):
+        """Drop a pending heartbeat that a direct write supersedes."""
+        self._pending.pop(tuple(key.values()), None)
+
+    def pending(self, student_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Unwritten progress (for one student, or everyone), shaped like
+        stored documents."""
+        entries = {**self._flushing, **self._pending}
+        return [{
+            **entry["key"],
+            "completion_percentage": entry["data"].completion_percentage,
+            "time_spent": entry["data"].time_spent,
+            "last_accessed": entry["at"],
+            "client_timestamp": entry["at"],
+        } for ident, entry in entries.items() if student_id is None or ident[0] == student_id]
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self._pending:
+                return 0
+            self._flushing, self._pending = self._pending, {}
+            try:
+                async with sync_write() as seq:
+                    entries = [
+                        (entry["key"], progress_upsert(entry["data"], entry["at"], seq, entry["at"]), entry["targets"])
+                        for entry in self._flushing.values()
+                    ]
+                    await write_progress(entries)
+            except Exception:
+                self.failures += 1
+                # Keep anything newer that arrived during the write
+                self._pending = {**self._flushing, **self._pending}
+                raise
+            finally:
+                self._flushing = {}
+            self.flushes += 1
+            self.written += len(entries)
+            return len(entries)
+
+    def _start_flush(self) -> asyncio.Task:
+        # Flushes run as tasks of their own, so cancelling the timer never
+        # interrupts a write; stop() waits for them.
+        task = asyncio.create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_done)
+        return task
+
+    def _flush_done(self, task: asyncio.Task):
+        self._flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Progress buffer flush failed; retrying next interval", exc_info=task.exception())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.wait([self._start_flush()])
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the timer, let flushes under way finish, and write whatever
+        is still pending."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "flushing": len(self._flushing),
+            "max_entries": self.max_entries,
+            "limit": self.limit,
+            "flush_interval_seconds": self.interval,
+            "flushes": self.flushes,
+            "written": self.written,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+progress_buffer = ProgressBuffer(PROGRESS_FLUSH_SECONDS, PROGRESS_BUFFER_MAX_ENTRIES, PROGRESS_BUFFER_LIMIT)
+
 @api_router.post("/progress")
 async def update_progress(progress_data: ProgressUpdate, user: dict = Depends(get_current_user)):
     if user['role'] != 'student':
         raise HTTPException(status_code=403, detail="Only students can update progress")
     
-    query = {"student_id": user['id']}
-    if progress_data.lesson_id:
-        query['lesson_id'] = progress_data.lesson_id
-    if progress_data.module_id:
-        query['module_id'] = progress_data.module_id
-    
-    existing = await db.progress.find_one(query)
+    key = progress_key(user['id'], progress_data.lesson_id, progress_data.module_id)
+    progress_buffer.discard(key)
+    async with sync_write() as seq:
+        update = progress_upsert(progress_data, datetime.now(timezone.utc), seq)
+        for attempt in range(2):
+            try:
+                before = await db.progress.find_one_and_update(
+                    key, update,
+                    projection={"_id": 0, "completion_percentage": 1},
+                    upsert=True,
+                    return_document=ReturnDocument.BEFORE
+                )
+                break
+            except DuplicateKeyError:
+                # Lost an upsert race to a concurrent request; the retry matches its document.
+                if attempt:
+                    raise
     
-    if existing:
-        await db.progress.update_one(
-            query,
-            {"$set": {
-                "completion_percentage": progress_data.completion_percentage,
-                "time_spent": progress_data.time_spent,
-                "last_accessed": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-    else:
-        progress = Progress(
-            student_id=user['id'],
-            lesson_id=progress_data.lesson_id,
-            module_id=progress_data.module_id,
-            completion_percentage=progress_data.completion_percentage,
-            time_spent=progress_data.time_spent
+    targets = rollup_targets(user['id'], user.get('class_name'), user.get('school'))
+    await bump_rollups({target: progress_rollup_delta(before, progress_data.completion_percentage) for target in targets})
+    return {"message": "Progress updated"}
+
+@api_router.post("/progress/heartbeat", status_code=202)
+async def progress_heartbeat(progress_data: ProgressUpdate, user: dict = Depends(get_current_user)):
+    """Record periodic progress through the write-behind buffer.
+
+    Heartbeats for the same lesson/module coalesce until the next flush;
+    GET /progress already includes them.
+    """
+    if user['role'] != 'student':
+        raise HTTPException(status_code=403, detail="Only students can update progress")
+    if not (progress_data.lesson_id or progress_data.module_id):
+        raise HTTPException(status_code=400, detail="A lesson_id or module_id is required")
+    if not progress_buffer.put(user, progress_data):
+        raise HTTPException(
+            status_code=503,
+            detail="Progress buffer is full, please try again",
+            headers={"Retry-After": str(math.ceil(PROGRESS_FLUSH_SECONDS))}
         )
-        doc = progress.model_dump()
-        doc['last_accessed'] = doc['last_accessed'].isoformat()
-        await db.progress.insert_one(doc)
+    return {"message": "Progress accepted"}
+
+@api_router.post("/progress/batch")
+async def sync_progress_batch(batch: ProgressBatch, user: dict = Depends(get_current_user)):
+    """Apply progress recorded while a device was offline.
+
+    Events for the same lesson/module collapse to the newest one, and an event
+    only overwrites stored progress that is not newer than it (last writer
+    wins by client_timestamp). Everything is written with one bulk_write.
+    """
+    if user['role'] != 'student':
+        raise HTTPException(status_code=403, detail="Only students can update progress")
+    if any(not (e.lesson_id or e.module_id) for e in batch.events):
+        raise HTTPException(status_code=400, detail="Each event needs a lesson_id or module_id")
     
-    return {"message": "Progress updated"}
+    latest: Dict[tuple, ProgressEvent] = {}
+    for event in batch.events:
+        ident = (event.lesson_id or None, event.module_id or None)
+        if ident not in latest or event.client_timestamp >= latest[ident].client_timestamp:
+            latest[ident] = event
+    if not latest:
+        return {"applied": 0, "stale": 0, "results": []}
+    events = list(latest.items())
+    
+    targets = rollup_targets(user['id'], user.get('class_name'), user.get('school'))
+    async with sync_write() as seq:
+        stale = await write_progress([
+            (progress_key(user['id'], lesson_id, module_id), progress_upsert(event, event.client_timestamp, seq), targets)
+            for (lesson_id, module_id), event in events
+        ])
+    results = [
+        {"lesson_id": lesson_id, "module_id": module_id, "status": "stale" if i in stale else "applied"}
+        for i, ((lesson_id, module_id), _) in enumerate(events)
+    ]
+    
+    return {"applied": len(events) - len(stale), "stale": len(stale), "results": results}
 
 @api_router.get("/progress")
-async def get_progress(student_id: Optional[str] = None, user: dict = Depends(get_current_user)):
+async def get_progress(response: Response, student_id: Optional[str] = None,
+                       from_: Optional[str] = Query(None, alias="from"), to: Optional[str] = None,
+                       limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT), after: Optional[str] = None,
+                       user: dict = Depends(get_current_user)):
+    """``from``/``to`` filter on last_accessed.
+
+    Buffered heartbeats are merged in: over their stored record, or, for
+    records not written yet, appended to the last page.
+    """
     query = {}
     if user['role'] == 'student':
         query['student_id'] = user['id']
     elif student_id:
         query['student_id'] = student_id
+    accessed = time_range(from_, to)
+    if accessed:
+        query['last_accessed'] = accessed
     
-    progress = await db.progress.find(query, {"_id": 0}).to_list(1000)
-    return progress
+    progress = await find_page(db.progress, query, {"_id": 0}, limit, after, response)
+    buffered = {
+        (doc['student_id'], doc['lesson_id'], doc['module_id']): doc
+        for doc in progress_buffer.pending(query.get('student_id'))
+    }
+    if buffered:
+        for doc in progress:
+            doc.update(buffered.pop((doc['student_id'], doc.get('lesson_id'), doc.get('module_id')), {}))
+        if buffered and "X-Next-Cursor" not in response.headers:
+            async for doc in db.progress.find(
+                {"$or": [{"student_id": s, "lesson_id": l, "module_id": m} for s, l, m in buffered]},
+                {"_id": 0, "student_id": 1, "lesson_id": 1, "module_id": 1}
+            ):
+                buffered.pop((doc['student_id'], doc.get('lesson_id'), doc.get('module_id')), None)
+            progress.extend(doc for doc in buffered.values() if in_time_range(doc['last_accessed'], accessed))
+    return json_response(progress, response)
+
+# ============= Sync Routes =============
+
+def encode_sync_token(seq: int) -> str:
+    return base64.urlsafe_b64encode(str(seq).encode('ascii')).decode('ascii').rstrip('=')
+
+def decode_sync_token(token: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('ascii'))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+def sync_scope(name: str, user: dict) -> Optional[Dict[str, Any]]:
+    """Filter limiting a synced collection to what ``user`` may see, or None
+    if the collection is not synced for their role."""
+    if name == "assignments":
+        if user['role'] == 'student':
+            return {"class_name": user.get('class_name')}
+        if user['role'] == 'teacher':
+            return {"teacher_id": user['id']}
+        return {}
+    if name == "progress":
+        return {"student_id": user['id']} if user['role'] == 'student' else None
+    return {}
+
+@api_router.get("/sync")
+async def sync_changes(since: Optional[str] = None, lang: Optional[Language] = None,
+                       user: dict = Depends(get_current_user)):
+    """Everything created, updated or deleted since the client's sync token.
+
+    Without ``since`` this is a full sync of every synced collection. The
+    returned token goes back as ``since`` next time.
+    """
+    since_seq = decode_sync_token(since) if since else None
+    # Changes are read up to the highest sequence with no write still pending
+    # at or below it; later ones, landed or not, wait for the next sync.
+    upper = await current_sync_seq()
+    
+    localized = {
+        "lessons": catalog_projection(LESSON_LOCALIZED_FIELDS, lang),
+        "digital_literacy": catalog_projection(MODULE_LOCALIZED_FIELDS, lang),
+    }
+    
+    async def changed(name: str, scope: Dict[str, Any]):
+        query = dict(scope)
+        if since_seq is not None:
+            query['_seq'] = {"$gt": since_seq, "$lte": upper}
+        projection = localized.get(name, {"_id": 0})
+        return await db[SYNC_COLLECTIONS[name]].find(query, projection).to_list(None)
+    
+    async def deleted(name: str, scope: Dict[str, Any]):
+        if since_seq is None:
+            return []
+        docs = await db.tombstones.find(
+            {"collection": SYNC_COLLECTIONS[name], **scope, "_seq": {"$gt": since_seq, "$lte": upper}},
+            {"_id": 0, "id": 1}
+        ).to_list(None)
+        return [d['id'] for d in docs]
+    
+    scopes = {name: sync_scope(name, user) for name in SYNC_COLLECTIONS}
+    scopes = {name: scope for name, scope in scopes.items() if scope is not None}
+    names = list(scopes)
+    results = await asyncio.gather(
+        *[changed(name, scopes[name]) for name in names],
+        *[deleted(name, scopes[name]) for name in names]
+    )
+    
+    payload = {"token": encode_sync_token(upper), "full": since_seq is None}
+    payload.update(zip(names, results[:len(names)]))
+    payload["deleted"] = dict(zip(names, results[len(names):]))
+    return json_response(payload)
 
 # ============= Analytics Routes =============
 
-@api_router.get("/analytics/class/{class_name}")
-async def get_class_analytics(class_name: str, user: dict = Depends(get_current_teacher)):
-    # Get students in class
-    students = await db.users.find({"class_name": class_name, "role": "student"}, {"_id": 0}).to_list(1000)
-    student_ids = [s['id'] for s in students]
-    
-    # Get attendance stats
-    attendance_records = await db.attendance.find({"student_id": {"$in": student_ids}}, {"_id": 0}).to_list(10000)
-    
-    # Get submission stats
-    submissions = await db.submissions.find({"student_id": {"$in": student_ids}}, {"_id": 0}).to_list(10000)
+def _lookup_stats(collection: str, group: Dict[str, Any], as_field: str) -> Dict[str, Any]:
+    """$lookup that folds a student's documents in ``collection`` into one stats row."""
+    return {"$lookup": {
+        "from": collection,
+        "localField": "id",
+        "foreignField": "student_id",
+        "pipeline": [{"$group": {"_id": None, **group}}],
+        "as": as_field
+    }}
+
+def _first(field: str) -> Dict[str, Any]:
+    return {"$ifNull": [{"$arrayElemAt": [field, 0]}, 0]}
+
+def _ratio(numerator: Any, denominator: Any) -> Dict[str, Any]:
+    return {"$cond": [{"$gt": [denominator, 0]}, {"$divide": [numerator, denominator]}, 0]}
+
+def class_analytics_pipeline(class_name: str) -> List[Dict[str, Any]]:
+    """Per-student and class-wide stats for ``class_name``, computed in Mongo.
+
+    Each student's history is reduced to a handful of counters inside the
+    $lookup, so neither the payload nor the server's memory grows with the
+    number of attendance, submission or progress records.
+    """
+    return [
+        {"$match": {"class_name": class_name, "role": "student"}},
+        {"$project": {"_id": 0, "password": 0}},
+        _lookup_stats("attendance", {
+            "records": {"$sum": 1},
+            "present": {"$sum": {"$cond": [{"$eq": ["$status", "present"]}, 1, 0]}}
+        }, "_attendance"),
+        _lookup_stats("submissions", {
+            "records": {"$sum": 1},
+            "graded": {"$sum": {"$cond": [{"$ne": [{"$ifNull": ["$marks", None]}, None]}, 1, 0]}},
+            "marks_sum": {"$sum": {"$ifNull": ["$marks", 0]}}
+        }, "_submissions"),
+        _lookup_stats("progress", {
+            "records": {"$sum": 1},
+            "completion_sum": {"$sum": {"$ifNull": ["$completion_percentage", 0]}}
+        }, "_progress"),
+        {"$set": {"_counts": {
+            "attendance_records": _first("$_attendance.records"),
+            "present_records": _first("$_attendance.present"),
+            "submissions": _first("$_submissions.records"),
+            "graded_submissions": _first("$_submissions.graded"),
+            "marks_sum": _first("$_submissions.marks_sum"),
+            "progress_records": _first("$_progress.records"),
+            "completion_sum": _first("$_progress.completion_sum")
+        }}},
+        {"$unset": ["_attendance", "_submissions", "_progress"]},
+        {"$facet": {
+            "students": [
+                {"$set": {"stats": {
+                    "attendance_records": "$_counts.attendance_records",
+                    "present_records": "$_counts.present_records",
+                    "attendance_rate": _ratio("$_counts.present_records", "$_counts.attendance_records"),
+                    "total_submissions": "$_counts.submissions",
+                    "graded_submissions": "$_counts.graded_submissions",
+                    "ungraded_submissions": {"$subtract": ["$_counts.submissions", "$_counts.graded_submissions"]},
+                    "avg_marks": _ratio("$_counts.marks_sum", "$_counts.graded_submissions"),
+                    "progress_records": "$_counts.progress_records",
+                    "avg_progress": _ratio("$_counts.completion_sum", "$_counts.progress_records")
+                }}},
+                {"$unset": "_counts"}
+            ],
+            "totals": [
+                {"$group": {
+                    "_id": None,
+                    "total_students": {"$sum": 1},
+                    "attendance_records": {"$sum": "$_counts.attendance_records"},
+                    "present_records": {"$sum": "$_counts.present_records"},
+                    "total_submissions": {"$sum": "$_counts.submissions"},
+                    "graded_submissions": {"$sum": "$_counts.graded_submissions"},
+                    "marks_sum": {"$sum": "$_counts.marks_sum"},
+                    "progress_records": {"$sum": "$_counts.progress_records"},
+                    "completion_sum": {"$sum": "$_counts.completion_sum"}
+                }},
+                {"$project": {
+                    "_id": 0,
+                    "total_students": 1,
+                    "attendance_records": 1,
+                    "present_records": 1,
+                    "attendance_rate": _ratio("$present_records", "$attendance_records"),
+                    "total_submissions": 1,
+                    "graded_submissions": 1,
+                    "ungraded_submissions": {"$subtract": ["$total_submissions", "$graded_submissions"]},
+                    "avg_marks": _ratio("$marks_sum", "$graded_submissions"),
+                    "progress_records": 1,
+                    "avg_progress": _ratio("$completion_sum", "$progress_records")
+                }}
+            ]
+        }}
+    ]
+
+EMPTY_CLASS_ANALYTICS = {
+    "total_students": 0,
+    "attendance_records": 0,
+    "present_records": 0,
+    "attendance_rate": 0,
+    "total_submissions": 0,
+    "graded_submissions": 0,
+    "ungraded_submissions": 0,
+    "avg_marks": 0,
+    "progress_records": 0,
+    "avg_progress": 0
+}
+
+async def compute_class_analytics(class_name: str) -> Dict[str, Any]:
+    result = await analytics_db.users.aggregate(class_analytics_pipeline(class_name)).to_list(1)
+    facets = result[0] if result else {"students": [], "totals": []}
+    totals = facets["totals"][0] if facets["totals"] else dict(EMPTY_CLASS_ANALYTICS)
+    students = facets["students"]
+    if ATTENDANCE_STORE == 'bitmap':
+        # The pipeline can't popcount, so attendance comes from the month bitmaps.
+        counts = {}
+        for row in await attendance_counts([s['id'] for s in students], analytics_db):
+            count = counts.setdefault(row['student_id'], [0, 0])
+            count[0] += row['records']
+            count[1] += row['present']
+        for target in [totals] + [s['stats'] for s in students]:
+            target['attendance_records'] = target['present_records'] = 0
+        for student in students:
+            records, present = counts.get(student['id'], (0, 0))
+            student['stats'].update(attendance_records=records, present_records=present)
+            totals['attendance_records'] += records
+            totals['present_records'] += present
+        for target in [totals] + [s['stats'] for s in students]:
+            records = target['attendance_records']
+            target['attendance_rate'] = target['present_records'] / records if records else 0
+    return {**totals, "students": students}
+
+async def class_analytics(class_name: str) -> Dict[str, Any]:
+    if not await rollups_ready():
+        return await compute_class_analytics(class_name)
+    rollup, students = await asyncio.gather(
+        analytics_db.analytics_rollups.find_one({"scope": "class", "key": class_name}, {"_id": 0}),
+        analytics_db.users.find({"class_name": class_name, "role": "student"}, {"_id": 0, "password": 0}).to_list(None)
+    )
+    if rollup is None:
+        # Rollups not built for this class yet
+        return await compute_class_analytics(class_name)
     
-    # Get progress stats
-    progress_records = await db.progress.find({"student_id": {"$in": student_ids}}, {"_id": 0}).to_list(10000)
+    student_rollups = {}
+    async for doc in analytics_db.analytics_rollups.find(
+        {"scope": "student", "key": {"$in": [s['id'] for s in students]}}, {"_id": 0}
+    ):
+        student_rollups[doc['key']] = doc
+    for student in students:
+        student['stats'] = rollup_stats(student_rollups.get(student['id'], {}))
     
     return {
         "total_students": len(students),
-        "attendance_records": len(attendance_records),
-        "total_submissions": len(submissions),
-        "avg_progress": sum([p.get('completion_percentage', 0) for p in progress_records]) / len(progress_records) if progress_records else 0,
+        **rollup_stats(rollup),
         "students": students
     }
+
+@api_router.get("/analytics/class/{class_name}")
+async def get_class_analytics(class_name: str, user: dict = Depends(get_current_teacher)):
+    return json_response(await single_flight.do("class_analytics", (class_name,), lambda: class_analytics(class_name)))
+
+@api_router.post("/admin/rollups/rebuild")
+async def rebuild_analytics_rollups(check_only: bool = False, user: dict = Depends(get_current_admin)):
+    return await rebuild_rollups(check_only=check_only)
+
 SEED_SECRET = os.environ.get("SEED_SECRET", "change-this-secret")
 
 @api_router.post("/admin/seed")
@@ -478,43 +3162,337 @@ async def seed_remote(secret: str):
         raise HTTPException(status_code=403, detail="Forbidden")
 
     # Clear existing data
+    await record_tombstones("lessons", {})
+    await record_tombstones("digital_literacy_modules", {})
     await db.users.delete_many({})
     await db.lessons.delete_many({})
     await db.digital_literacy_modules.delete_many({})
+    user_cache.clear()
 
     from seed_data import seed_database
     await seed_database()
+    await stamp_unsynced("lessons")
+    await stamp_unsynced("digital_literacy_modules")
+    catalog_cache.bump()
+    await refresh_search_index()
 
     return {"message": "Database seeded successfully"}
 
+@api_router.get("/admin/cache/stats")
+async def get_cache_stats(user: dict = Depends(get_current_admin)):
+    return {"user_cache": user_cache.stats(), "catalog_cache": catalog_cache.stats(), "search_index": search_index.stats(),
+            "progress_buffer": progress_buffer.stats(), "single_flight": single_flight.stats(),
+            "sync_sequence": sync_sequence.stats()}
+
+@api_router.get("/admin/db/routing")
+async def get_db_routing(user: dict = Depends(get_current_admin)):
+    """Read preference, pool settings and known servers of each route class's client."""
+    routing = {}
+    for route_class, route_client in clients.items():
+        pool = route_client.options.pool_options
+        topology = route_client.topology_description
+        routing[route_class] = {
+            "read_preference": route_client.read_preference.document,
+            "max_pool_size": pool.max_pool_size,
+            "min_pool_size": pool.min_pool_size,
+            "server_selection_timeout_s": route_client.options.server_selection_timeout,
+            "connect_timeout_s": pool.connect_timeout,
+            "socket_timeout_s": pool.socket_timeout,
+            "wait_queue_timeout_s": pool.wait_queue_timeout,
+            "topology": topology.topology_type_name,
+            "servers": [
+                {"address": f"{host}:{port}", "type": server.server_type_name}
+                for (host, port), server in topology.server_descriptions().items()
+            ],
+        }
+    return routing
+
+@api_router.get("/admin/profiler")
+async def get_profiler_findings(user: dict = Depends(get_current_admin)):
+    return {
+        "enabled": PROFILER_ENABLED,
+        "slow_request_ms": PROFILER_SLOW_REQUEST_SECONDS * 1000,
+        "slow_query_ms": PROFILER_SLOW_QUERY_SECONDS * 1000,
+        "n_plus_one_threshold": PROFILER_N_PLUS_ONE,
+        "findings": list(reversed(profiler_findings)),
+    }
+
+@api_router.delete("/admin/profiler")
+async def clear_profiler_findings(user: dict = Depends(get_current_admin)):
+    profiler_findings.clear()
+    return {"message": "Profiler findings cleared"}
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of request, Mongo and password-pool metrics."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ============= Export Routes =============
+
+EXPORT_COLUMNS = {
+    "attendance": ["student_id", "class_name", "date", "status", "marked_by"],
+    "submissions": ["id", "assignment_id", "student_id", "class_name", "school", "marks", "feedback", "submitted_at"],
+    "progress": ["student_id", "lesson_id", "module_id", "completion_percentage", "time_spent", "last_accessed"],
+}
+# Timestamp field each export's date range applies to
+EXPORT_DATE_FIELDS = {"attendance": "date", "submissions": "submitted_at", "progress": "last_accessed"}
+
+async def export_student_ids(school: Optional[str], class_name: Optional[str]) -> List[str]:
+    query = {"role": "student"}
+    if school:
+        query['school'] = school
+    if class_name:
+        query['class_name'] = class_name
+    return [u['id'] async for u in analytics_db.users.find(query, {"_id": 0, "id": 1})]
+
+async def export_records(kind: str, school: Optional[str], class_name: Optional[str],
+                         start: Optional[Date], end: Optional[Date]):
+    """Yield batches of export rows, reading the cursor EXPORT_BATCH_SIZE at a time."""
+    query: Dict[str, Any] = {}
+    if kind == "attendance" and not school:
+        if class_name:
+            query['class_name'] = class_name
+    elif school or class_name:
+        # Only attendance records carry their class; everything else is
+        # filtered through the students of the school/class.
+        query['student_id'] = {"$in": await export_student_ids(school, class_name)}
+        if kind == "attendance" and class_name:
+            query['class_name'] = class_name
+    
+    bitmap = kind == "attendance" and ATTENDANCE_STORE == 'bitmap'
+    if bitmap:
+        if start or end:
+            query['month'] = {}
+            if start:
+                query['month']['$gte'] = month_key(start)
+            if end:
+                query['month']['$lte'] = month_key(end)
+        collection, projection = analytics_db.attendance_months, {"_id": 0}
+    else:
+        field = EXPORT_DATE_FIELDS[kind]
+        if start or end:
+            query[field] = {}
+            if start:
+                query[field]['$gte'] = day_start(start)
+            if end:
+                # "< next day" keeps all of ``end``
+                query[field]['$lt'] = day_start(end + timedelta(days=1))
+        collection = analytics_db[kind]
+        projection = {"_id": 0, **{column: 1 for column in EXPORT_COLUMNS[kind]}}
+    
+    cursor = collection.find(query, projection).batch_size(EXPORT_BATCH_SIZE)
+    try:
+        batch = []
+        async for doc in cursor:
+            if bitmap:
+                rows = [
+                    attendance_out(r) for r in expand_attendance_month(doc)
+                    if (not start or r['date'] >= day_start(start)) and (not end or r['date'] <= day_start(end))
+                ]
+                batch.extend(rows)
+            else:
+                batch.append(attendance_out(doc) if kind == "attendance" else doc)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        await cursor.close()
+
+def csv_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # Attendance days are midnight UTC; write them as plain dates
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat()
+    return value
+
+def encode_csv(rows: List[Dict[str, Any]], columns: List[str], header: bool = False) -> str:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=columns, extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    writer.writerows({column: csv_value(row.get(column)) for column in columns} for row in rows)
+    return out.getvalue()
+
+@api_router.get("/export/{kind}")
+async def export_data(kind: Literal['attendance', 'submissions', 'progress'], request: Request,
+                      format: Literal['csv', 'ndjson'] = 'csv',
+                      school: Optional[str] = None, class_name: Optional[str] = None,
+                      from_date: Optional[str] = None, to_date: Optional[str] = None,
+                      user: dict = Depends(get_current_admin)):
+    """Stream a term report as CSV or NDJSON.
+
+    Rows are written batch by batch as the cursor is read, so memory stays
+    flat however large the export; a client disconnect stops the export and
+    closes the cursor.
+    """
+    start = parse_attendance_date(from_date) if from_date else None
+    end = parse_attendance_date(to_date) if to_date else None
+    columns = EXPORT_COLUMNS[kind]
+    
+    async def stream():
+        if format == 'csv':
+            yield encode_csv([], columns, header=True)
+        async for batch in export_records(kind, school, class_name, start, end):
+            if await request.is_disconnected():
+                break
+            if format == 'csv':
+                yield encode_csv(batch, columns)
+            else:
+                yield b"".join(dumps_json({c: row.get(c) for c in columns}) + b"\n" for row in batch)
+    
+    media_type = "text/csv; charset=utf-8" if format == 'csv' else "application/x-ndjson"
+    filename = f"{kind}.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(stream(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
 # ============= Students List Route =============
 
 @api_router.get("/students")
-async def get_students(class_name: Optional[str] = None, user: dict = Depends(get_current_teacher)):
+async def get_students(response: Response, class_name: Optional[str] = None,
+                       limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT), after: Optional[str] = None,
+                       user: dict = Depends(get_current_teacher)):
     query = {"role": "student"}
     if class_name:
         query['class_name'] = class_name
     
-    students = await db.users.find(query, {"_id": 0, "password": 0}).to_list(1000)
-    return students
+    students = await find_page(db.users, query, {"_id": 0, "password": 0}, limit, after, response)
+    return json_response(students, response)
+
+# ============= Dashboard Bootstrap =============
+
+async def bootstrap_list(collection, query: Dict[str, Any], projection: Dict[str, Any], limit: int,
+                         newest_first: bool = False) -> Dict[str, Any]:
+    """First page of a dashboard list, with the cursor for fetching the rest
+    from the list's own endpoint."""
+    page = Response()
+    items = await find_page(collection, query, projection, limit, None, page, newest_first)
+    return {"items": items, "next_cursor": page.headers.get('X-Next-Cursor')}
+
+def bootstrap_lang(lang: Optional[str], user: dict) -> Optional[str]:
+    lang = lang or user.get('language_preference')
+    return lang if lang in LANGUAGES else None
+
+def bootstrap_response(request: Request, body: Dict[str, Any]) -> Response:
+    """The combined payload with a content ETag; 304 when it still matches."""
+    content = dumps_json(body)
+    etag = f'"{hashlib.sha1(content).hexdigest()}"'
+    # Per-user data: revalidate every time, never from a shared cache
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@api_router.get("/bootstrap/student")
+async def bootstrap_student(request: Request, lang: Optional[Language] = None,
+                            view: Literal['full', 'summary'] = 'summary',
+                            limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                            user: dict = Depends(get_current_user)):
+    """Everything StudentDashboard loads, in one round trip.
+
+    Catalog text is projected to ``lang`` (default: the user's language
+    preference). Each list carries ``next_cursor`` for its own endpoint.
+    """
+    if user['role'] != 'student':
+        raise HTTPException(status_code=403, detail="Student access required")
+    lang = bootstrap_lang(lang, user)
+    summary = view == 'summary'
+    catalog = catalog_database()
+    lessons, modules, assignments, progress = await asyncio.gather(
+        bootstrap_list(catalog.lessons, {},
+                       catalog_projection(LESSON_LOCALIZED_FIELDS, lang, LESSON_SUMMARY_EXCLUDES, summary), limit),
+        bootstrap_list(catalog.digital_literacy_modules, {},
+                       catalog_projection(MODULE_LOCALIZED_FIELDS, lang, MODULE_SUMMARY_EXCLUDES, summary), limit),
+        bootstrap_list(db.assignments, {"class_name": user.get('class_name')}, {"_id": 0}, limit),
+        bootstrap_list(db.progress, {"student_id": user['id']}, {"_id": 0}, limit)
+    )
+    return bootstrap_response(request, {
+        "user": {k: v for k, v in user.items() if k not in ('_id', 'password')},
+        "lang": lang,
+        "lessons": lessons,
+        "digital_literacy": modules,
+        "assignments": assignments,
+        "progress": progress
+    })
+
+@api_router.get("/bootstrap/teacher")
+async def bootstrap_teacher(request: Request, class_name: Optional[str] = None,
+                            limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                            user: dict = Depends(get_current_teacher)):
+    """Everything TeacherDashboard loads, in one round trip.
+
+    ``class_name`` defaults to the teacher's own class; without one there
+    are no students or analytics. Submissions are those for the teacher's
+    assignments, newest first (continue with ``/submissions?order=newest``).
+    """
+    class_name = class_name or user.get('class_name')
+    assignment_query = {"teacher_id": user['id']} if user['role'] == 'teacher' else {}
+    lists = [
+        bootstrap_list(db.assignments, assignment_query, {"_id": 0}, limit),
+        bootstrap_list(db.submissions, await submission_scope(user), {"_id": 0}, limit, newest_first=True),
+    ]
+    if class_name:
+        lists.append(bootstrap_list(db.users, {"role": "student", "class_name": class_name},
+                                    {"_id": 0, "password": 0}, limit))
+        lists.append(single_flight.do("class_analytics", (class_name,), lambda: class_analytics(class_name)))
+    assignments, submissions, *per_class = await asyncio.gather(*lists)
+    students, analytics = per_class or ({"items": [], "next_cursor": None}, None)
+    return bootstrap_response(request, {
+        "user": {k: v for k, v in user.items() if k not in ('_id', 'password')},
+        "class_name": class_name,
+        "students": students,
+        "assignments": assignments,
+        "submissions": submissions,
+        "analytics": analytics
+    })
 
 # Include router
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Outermost, so latency covers compression and CORS too
+app.add_middleware(MetricsMiddleware)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def provision_indexes():
+    # Build in the background so a large collection doesn't hold up readiness.
+    app.state.index_task = asyncio.create_task(ensure_indexes())
+    if not await rollups_ready():
+        logger.warning("Analytics rollups not built yet; class analytics aggregates raw data until "
+                       "rebuild_rollups.py (or POST /api/admin/rollups/rebuild) has run")
+    refresh_search_index()
+    sync_sequence.start()
+    progress_buffer.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    # Buffered heartbeats must reach Mongo before the clients close
+    try:
+        await progress_buffer.stop()
+    except Exception:
+        logger.exception("Final progress flush failed; %d updates lost", len(progress_buffer.pending()))
+    try:
+        await sync_sequence.stop()
+    except Exception:
+        logger.exception("Releasing sync sequence leases failed; /sync may hold back for %ss",
+                         SYNC_PENDING_TIMEOUT_SECONDS)
+    for route_client in clients.values():
+        route_client.close()
+    password_executor.shutdown(wait=False)
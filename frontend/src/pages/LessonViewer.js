@@ -49,7 +49,7 @@ export default function LessonViewer({ user, onLogout }) {
       const newProgress = Math.min(progress + 10, 100);
       setProgress(newProgress);
 
-      await axios.post(`${API}/progress`, {
+      await axios.post(`${API}/progress/heartbeat`, {
         lesson_id: id,
         completion_percentage: newProgress,
         time_spent: timeSpent
@@ -51,7 +51,7 @@ export default function ModuleViewer({ user, onLogout }) {
       const newProgress = Math.min(progress + 10, 100);
       setProgress(newProgress);
 
-      await axios.post(`${API}/progress`, {
+      await axios.post(`${API}/progress/heartbeat`, {
         module_id: id,
         completion_percentage: newProgress,
         time_spent: timeSpent
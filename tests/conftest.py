@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# server.py lives in backend/ and is imported as a top-level module, as are
+# the shared fakes next to the tests
+TESTS = Path(__file__).resolve().parent
+sys.path.insert(0, str(TESTS.parent / "backend"))
+sys.path.insert(0, str(TESTS))
@@ -0,0 +1,168 @@
+"""In-memory stand-ins for the few Motor collection methods the tested code
+calls. They implement only the query and update shapes server.py issues."""
+from bson import ObjectId
+
+
+def matches_value(value, condition):
+    if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+        checks = {
+            "$gt": lambda c: value is not None and value > c,
+            "$gte": lambda c: value is not None and value >= c,
+            "$lt": lambda c: value is not None and value < c,
+            "$lte": lambda c: value is not None and value <= c,
+            "$ne": lambda c: value != c,
+            "$in": lambda c: value in c,
+            "$exists": lambda c: (value is not None) == c,
+        }
+        return all(checks[op](operand) for op, operand in condition.items())
+    return value == condition
+
+
+def matches(doc, query):
+    return all(matches_value(doc.get(field), condition) for field, condition in query.items())
+
+
+def project(doc, projection):
+    projection = projection or {}
+    included = [f for f, v in projection.items() if v and f != "_id"]
+    if included:
+        out = {f: doc[f] for f in included if f in doc}
+        if projection.get("_id", 1):
+            out["_id"] = doc["_id"]
+        return out
+    return {f: v for f, v in doc.items() if projection.get(f, 1)}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self.docs:
+            yield doc
+
+    async def to_list(self, length):
+        return list(self.docs if length is None else self.docs[:length])
+
+
+class BulkResult:
+    def __init__(self, upserted_count, modified_count):
+        self.upserted_count = upserted_count
+        self.modified_count = modified_count
+
+
+class FakeCollection:
+    """find / insert_many / bulk_write / delete_many, plus aggregate for
+    the $sort/$group/$match pipeline dedupe() runs."""
+
+    def __init__(self, docs=()):
+        self.docs = [{"_id": ObjectId(), **doc} for doc in docs]
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([project(d, projection) for d in self.docs if matches(d, query or {})])
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend({"_id": ObjectId(), **doc} for doc in docs)
+
+    async def bulk_write(self, ops, ordered=False):
+        """UpdateOne ops with $set, $setOnInsert and $inc, upserting like Mongo."""
+        upserted = modified = 0
+        for op in ops:
+            update = op._doc
+            doc = next((d for d in self.docs if matches(d, op._filter)), None)
+            if doc is None:
+                if not op._upsert:
+                    continue
+                doc = {"_id": ObjectId(), **{k: v for k, v in op._filter.items() if not isinstance(v, dict)},
+                       **update.get("$setOnInsert", {})}
+                self.docs.append(doc)
+                upserted += 1
+                before = None
+            else:
+                before = dict(doc)
+            doc.update(update.get("$set", {}))
+            for field, amount in update.get("$inc", {}).items():
+                doc[field] = doc.get(field, 0) + amount
+            if before is not None and doc != before:
+                modified += 1
+        return BulkResult(upserted, modified)
+
+    async def delete_many(self, query):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not matches(d, query)]
+        return type("DeleteResult", (), {"deleted_count": before - len(self.docs)})()
+
+    def aggregate(self, pipeline, **kwargs):
+        docs = list(self.docs)
+        for stage in pipeline:
+            if "$sort" in stage:
+                for field, direction in reversed(list(stage["$sort"].items())):
+                    docs.sort(key=lambda d: (d.get(field) is not None, d.get(field)), reverse=direction < 0)
+            elif "$group" in stage:
+                spec = stage["$group"]
+                groups = {}
+                for doc in docs:
+                    key = {name: doc.get(expr["$ifNull"][0][1:]) for name, expr in spec["_id"].items()}
+                    group = groups.setdefault(tuple(key.items()), {"_id": key, "keep": doc["_id"], "count": 0})
+                    group["count"] += 1
+                docs = list(groups.values())
+            elif "$match" in stage:
+                docs = [d for d in docs if matches(d, stage["$match"])]
+        return FakeCursor(docs)
+
+
+def evaluate(expr, doc):
+    """The few aggregation expressions the sequence allocation uses."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if isinstance(expr, dict) and "$add" in expr:
+        return sum(evaluate(e, doc) for e in expr["$add"])
+    if isinstance(expr, dict) and "$ifNull" in expr:
+        value = evaluate(expr["$ifNull"][0], doc)
+        return value if value is not None else expr["$ifNull"][1]
+    if isinstance(expr, dict):
+        return {k: evaluate(v, doc) for k, v in expr.items()}
+    return expr
+
+
+class FakeCounters:
+    """db.counters holding the sync_seq document."""
+
+    def __init__(self):
+        self.doc = None
+        self.round_trips = 0
+
+    def _lease_path(self, path):
+        return path.split(".", 1)[1]
+
+    async def find_one(self, query):
+        self.round_trips += 1
+        return self.doc and {**self.doc, "leases": dict(self.doc.get("leases", {}))}
+
+    async def find_one_and_update(self, query, pipeline, **kwargs):
+        self.round_trips += 1
+        before = self.doc or {"_id": "sync_seq"}
+        after = {**before, "leases": dict(before.get("leases", {}))}
+        for stage in pipeline:
+            for path, expr in stage["$set"].items():
+                if path.startswith("leases."):
+                    after["leases"][self._lease_path(path)] = evaluate(expr, before)
+                else:
+                    after[path] = evaluate(expr, before)
+        self.doc = after
+        return after
+
+    async def update_one(self, query, update):
+        self.round_trips += 1
+        for path, condition in query.items():
+            if path.startswith("leases."):
+                lease = self.doc["leases"].get(path.split(".")[1])
+                if lease is None or not lease["at"] <= condition["$lte"]:
+                    return
+        for path, value in update.get("$set", {}).items():
+            self.doc["leases"][self._lease_path(path)] = value
+        for path in update.get("$unset", {}):
+            self.doc["leases"].pop(self._lease_path(path), None)
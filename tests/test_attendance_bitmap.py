@@ -0,0 +1,106 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import (
+    bitmap_attendance_op, bitmap_status, day_bit, day_range_mask,
+    expand_attendance_month, month_key, month_range_mask,
+)
+
+
+def apply_bit_update(doc, update):
+    """Apply a $bit update the way Mongo does."""
+    for field, ops in update["$bit"].items():
+        value = doc.get(field, 0)
+        for op, operand in ops.items():
+            value = value & operand if op == "and" else value | operand
+        doc[field] = value
+    return doc
+
+
+def test_day_bit_and_month_key():
+    assert day_bit(date(2025, 3, 1)) == 0b1
+    assert day_bit(date(2025, 3, 31)) == 1 << 30
+    assert month_key(date(2025, 3, 9)) == "2025-03"
+
+
+def test_day_range_mask_is_inclusive():
+    assert day_range_mask(1, 1) == 0b1
+    assert day_range_mask(2, 4) == 0b1110
+    assert day_range_mask(1, 31) == (1 << 31) - 1
+    assert day_range_mask(31, 31) == 1 << 30
+
+
+def test_month_range_mask_trims_only_the_edge_months():
+    start, end = date(2025, 1, 20), date(2025, 3, 5)
+    assert month_range_mask("2025-01", start, end) == day_range_mask(20, 31)
+    assert month_range_mask("2025-02", start, end) == day_range_mask(1, 31)
+    assert month_range_mask("2025-03", start, end) == day_range_mask(1, 5)
+    # Both edges in one month
+    assert month_range_mask("2025-03", date(2025, 3, 2), date(2025, 3, 3)) == 0b110
+
+
+def test_month_range_mask_counts_a_summary_across_months():
+    # Jan 31 present, Feb 1 absent, Feb 2 present; summary from Jan 31 to Feb 1
+    jan = {"month": "2025-01", "marked": day_bit(date(2025, 1, 31)), "present": day_bit(date(2025, 1, 31))}
+    feb = {"month": "2025-02", "marked": 0b11, "present": 0b10}
+    start, end = date(2025, 1, 31), date(2025, 2, 1)
+    marked = present = 0
+    for doc in (jan, feb):
+        bits = doc["marked"] & month_range_mask(doc["month"], start, end)
+        marked += bits.bit_count()
+        present += (doc["present"] & bits).bit_count()
+    assert (marked, present) == (2, 1)
+
+
+def test_bitmap_op_marks_and_overwrites_a_day():
+    day = date(2025, 3, 4)
+    op = bitmap_attendance_op("Class 8A", "s1", day, "present")
+    assert op._filter == {"class_name": "Class 8A", "month": "2025-03", "student_id": "s1"}
+    doc = apply_bit_update({}, op._doc)
+    assert bitmap_status(doc, day_bit(day)) == "present"
+
+    doc = apply_bit_update(doc, bitmap_attendance_op("Class 8A", "s1", day, "absent")._doc)
+    assert bitmap_status(doc, day_bit(day)) == "absent"
+    # Other days stay unmarked
+    assert bitmap_status(doc, day_bit(date(2025, 3, 5))) is None
+
+
+def test_bitmap_op_leaves_other_days_alone():
+    doc = {}
+    for day, status in ((1, "present"), (2, "absent"), (3, "present")):
+        apply_bit_update(doc, bitmap_attendance_op("C", "s1", date(2025, 3, day), status)._doc)
+    apply_bit_update(doc, bitmap_attendance_op("C", "s1", date(2025, 3, 2), "present")._doc)
+    assert doc == {"marked": 0b111, "present": 0b111}
+
+
+def test_expand_attendance_month():
+    doc = {"student_id": "s1", "class_name": "C", "month": "2024-02", "marked": day_range_mask(28, 29) | 0b1,
+           "present": 1 << 28}
+    records = expand_attendance_month(doc)
+    assert [(r["date"], r["status"]) for r in records] == [
+        (datetime(2024, 2, 1, tzinfo=timezone.utc), "absent"),
+        (datetime(2024, 2, 28, tzinfo=timezone.utc), "absent"),
+        (datetime(2024, 2, 29, tzinfo=timezone.utc), "present"),
+    ]
+    assert all(r["student_id"] == "s1" and r["class_name"] == "C" for r in records)
+
+
+def test_expand_attendance_month_single_day():
+    doc = {"student_id": "s1", "class_name": "C", "month": "2025-03", "marked": 0b101, "present": 0b100}
+    assert [r["status"] for r in expand_attendance_month(doc, date(2025, 3, 3))] == ["present"]
+    assert expand_attendance_month(doc, date(2025, 3, 2)) == []
+
+
+def test_attendance_out_keeps_the_date_only_format():
+    doc = {"student_id": "s1", "class_name": "C", "month": "2025-03", "marked": 0b100, "present": 0b100}
+    records = [server.attendance_out(r) for r in expand_attendance_month(doc)]
+    assert records == [{"student_id": "s1", "class_name": "C", "date": "2025-03-03", "status": "present"}]
+
+
+def test_parse_attendance_date_rejects_other_formats():
+    assert server.parse_attendance_date("2025-03-04") == date(2025, 3, 4)
+    with pytest.raises(HTTPException):
+        server.parse_attendance_date("04/03/2025")
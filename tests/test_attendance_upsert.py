@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import server
+from fakes import FakeCollection
+from server import AttendanceCreate, mark_attendance
+
+TEACHER = {"id": "t1", "role": "teacher"}
+STUDENTS = [{"id": f"s{n}", "role": "student", "class_name": "Class 8A", "school": "School 1"} for n in range(3)]
+
+
+class FakeDB:
+    def __init__(self):
+        self.users = FakeCollection(STUDENTS)
+        self.attendance = FakeCollection()
+        self.analytics_rollups = FakeCollection()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(server, "db", fake)
+    monkeypatch.setattr(server, "ATTENDANCE_STORE", "documents")
+    return fake
+
+
+def mark(statuses, day="2025-03-04"):
+    body = AttendanceCreate(class_name="Class 8A", date=day, students=[
+        {"student_id": student_id, "status": status} for student_id, status in statuses
+    ])
+    return asyncio.run(mark_attendance(body, TEACHER))
+
+
+def class_rollup(fake_db):
+    return next(d for d in fake_db.analytics_rollups.docs if d["scope"] == "class")
+
+
+def counts(result):
+    return result["inserted"], result["updated"], result["unchanged"]
+
+
+def test_resending_a_roll_call_changes_nothing(fake_db):
+    roll = [("s0", "present"), ("s1", "absent"), ("s2", "present")]
+    assert counts(mark(roll)) == (3, 0, 0)
+    assert counts(mark(roll)) == (0, 0, 3)
+    assert len(fake_db.attendance.docs) == 3
+    rollup = class_rollup(fake_db)
+    assert (rollup["attendance_records"], rollup["present_records"]) == (3, 2)
+
+
+def test_changed_status_is_updated_in_place(fake_db):
+    mark([("s0", "present"), ("s1", "absent")])
+    assert counts(mark([("s0", "present"), ("s1", "present")])) == (0, 1, 1)
+    assert {d["student_id"]: d["status"] for d in fake_db.attendance.docs} == {"s0": "present", "s1": "present"}
+    rollup = class_rollup(fake_db)
+    assert (rollup["attendance_records"], rollup["present_records"]) == (2, 2)
+
+
+def test_another_day_is_a_new_record(fake_db):
+    mark([("s0", "present")])
+    assert counts(mark([("s0", "present")], day="2025-03-05")) == (1, 0, 0)
+
+
+def test_last_entry_wins_within_one_submission(fake_db):
+    assert counts(mark([("s0", "present"), ("s0", "absent")])) == (1, 0, 0)
+    assert [d["status"] for d in fake_db.attendance.docs] == ["absent"]
+
+
+class RacingCollection(FakeCollection):
+    """Loses the first upsert race: another writer inserted the keys first."""
+
+    def __init__(self):
+        super().__init__()
+        self.attempts = 0
+
+    async def bulk_write(self, ops, ordered=False):
+        self.attempts += 1
+        if self.attempts == 1:
+            await self.insert_many([{"k": 0, "v": 0}])  # the other writer's document
+            await super().bulk_write(ops[1:])
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}], "nUpserted": 1, "nModified": 0})
+        return await super().bulk_write(ops)
+
+
+def test_bulk_upsert_retries_keys_lost_to_a_concurrent_insert():
+    collection = RacingCollection()
+    ops = [server.UpdateOne({"k": n}, {"$set": {"v": 1}}, upsert=True) for n in range(2)]
+    assert asyncio.run(server.bulk_upsert(collection, ops)) == (1, 1)
+    assert collection.attempts == 2
+    assert sorted((d["k"], d["v"]) for d in collection.docs) == [(0, 1), (1, 1)]
+
+
+def test_bulk_upsert_raises_other_write_errors():
+    class Failing(FakeCollection):
+        async def bulk_write(self, ops, ordered=False):
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121}]})
+
+    with pytest.raises(BulkWriteError):
+        asyncio.run(server.bulk_upsert(Failing(), [server.UpdateOne({"k": 1}, {"$set": {"v": 1}}, upsert=True)]))
+
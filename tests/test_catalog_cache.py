@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+import server
+from server import CatalogCache, catalog_response, etag_matches
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = CatalogCache(maxsize=10, ttl=60)
+    monkeypatch.setattr(server, "catalog_cache", cache)
+    return cache
+
+
+def request(path="/api/lessons", query=b"", headers=None):
+    return Request({
+        "type": "http", "method": "GET", "path": path, "query_string": query,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    })
+
+
+def serve(body, **kwargs):
+    loads = []
+
+    async def load(page):
+        loads.append(1)
+        page.headers["X-Next-Cursor"] = "abc"
+        return body
+
+    response = asyncio.run(catalog_response(request(**kwargs), load))
+    return response, loads
+
+
+def test_etag_matches_weak_lists_and_star():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a", "b"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
+
+
+def test_miss_then_hit_serves_cached_bytes_with_etag():
+    first, loads = serve([{"id": "l1"}])
+    assert first.status_code == 200 and loads == [1]
+    assert first.headers["x-next-cursor"] == "abc"
+    second, loads = serve([{"id": "changed"}])
+    assert loads == [] and second.body == first.body
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+def test_matching_if_none_match_gets_a_bodyless_304():
+    first, _ = serve([{"id": "l1"}])
+    etag = first.headers["etag"]
+    response, _ = serve([{"id": "l1"}], headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.body == b""
+    assert response.headers["etag"] == etag
+
+
+def test_bump_invalidates_and_the_old_etag_no_longer_matches(fresh_cache):
+    first, _ = serve([{"id": "l1"}])
+    fresh_cache.bump()
+    response, loads = serve([{"id": "l2"}], headers={"If-None-Match": first.headers["etag"]})
+    assert loads == [1] and response.status_code == 200
+    assert response.headers["etag"] != first.headers["etag"]
+
+
+def test_if_modified_since_alone_never_gets_a_304():
+    serve([{"id": "l1"}])
+    response, _ = serve([{"id": "l1"}], headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert response.status_code == 200
+    assert "last-modified" not in response.headers
@@ -0,0 +1,77 @@
+import asyncio
+import zlib
+
+import httpx
+from starlette.responses import Response, StreamingResponse
+
+import server
+from server import CompressionMiddleware, negotiate_encoding
+
+
+def test_negotiate_encoding_prefers_highest_q(monkeypatch):
+    monkeypatch.setattr(server, "brotli", object())
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("br;q=0.5, gzip;q=0.8") == "gzip"
+    assert negotiate_encoding("gzip;q=0, br;q=0") is None
+    assert negotiate_encoding("*;q=0.3") == "br"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("GZIP; q=1") == "gzip"
+    assert negotiate_encoding("gzip;q=bogus, br;q=0.1") == "br"
+
+
+def test_negotiate_encoding_without_brotli(monkeypatch):
+    monkeypatch.setattr(server, "brotli", None)
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("br, gzip;q=0.1") == "gzip"
+
+
+def serve(response, accept_encoding="gzip"):
+    async def app(scope, receive, send):
+        await response(scope, receive, send)
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=CompressionMiddleware(app, minimum_size=100))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/", headers={"Accept-Encoding": accept_encoding})
+
+    return asyncio.run(fetch())
+
+
+def raw_body(response):
+    return zlib.decompress(response.content, 31) if response.headers.get("content-encoding") == "gzip" else response.content
+
+
+def test_large_json_is_gzipped(monkeypatch):
+    monkeypatch.setattr(server, "brotli", None)
+    body = b'{"title": "' + "ਪਾਣੀ ਦਾ ਚੱਕਰ ".encode() * 50 + b'"}'
+    response = serve(Response(body, media_type="application/json"))
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) < len(body)
+    assert response.content == body  # httpx decodes it
+
+
+def test_small_and_binary_responses_pass_through(monkeypatch):
+    monkeypatch.setattr(server, "brotli", None)
+    small = serve(Response(b'{"ok": true}', media_type="application/json"))
+    assert "content-encoding" not in small.headers
+    binary = serve(Response(b"\x00" * 500, media_type="image/png"))
+    assert "content-encoding" not in binary.headers
+
+
+def test_no_acceptable_encoding_passes_through():
+    response = serve(Response(b"x" * 500, media_type="application/json"), accept_encoding="identity")
+    assert "content-encoding" not in response.headers and response.content == b"x" * 500
+
+
+def test_streaming_responses_are_compressed_chunk_by_chunk(monkeypatch):
+    monkeypatch.setattr(server, "brotli", None)
+
+    async def rows():
+        for n in range(3):
+            yield f"row {n}\n".encode()
+
+    response = serve(StreamingResponse(rows(), media_type="text/csv"))
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == b"row 0\nrow 1\nrow 2\n"
@@ -0,0 +1,71 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+from fakes import FakeCollection, FakeCounters
+
+STUDENT = {"id": "s1", "role": "student", "class_name": "Class 8A"}
+
+
+def ts(day: int) -> datetime:
+    return datetime(2025, 3, day, tzinfo=timezone.utc)
+
+
+def progress(id_, student_id, day, lesson_id="l1"):
+    return {"id": id_, "student_id": student_id, "lesson_id": lesson_id, "module_id": None,
+            "completion_percentage": float(day), "client_timestamp": ts(day), "last_accessed": ts(day), "_seq": 1}
+
+
+class FakeDB:
+    def __init__(self, progress_docs):
+        self.counters = FakeCounters()
+        self.counters.doc = {"_id": "sync_seq", "value": 1}  # the documents below were written at 1
+        self.tombstones = FakeCollection()
+        self.progress = FakeCollection(progress_docs)
+        self.lessons = FakeCollection()
+        self.digital_literacy_modules = FakeCollection()
+        self.assignments = FakeCollection()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDB([
+        progress("old", "s1", 3), progress("newest", "s1", 5), progress("older", "s1", 1),
+        progress("other-lesson", "s1", 2, lesson_id="l2"), progress("s2-only", "s2", 4),
+    ])
+    monkeypatch.setattr(server, "db", fake)
+    monkeypatch.setattr(server, "sync_sequence", server.SyncSequence(batch=10, refresh=60))
+    return fake
+
+
+def sync(since=None, user=STUDENT):
+    response = asyncio.run(server.sync_changes(since=since, lang=None, user=user))
+    return json.loads(response.body)
+
+
+def dedupe_progress():
+    keep_sort = server.DEDUPE_BEFORE_INDEX[("progress", "student_lesson_module_unique")]
+    return asyncio.run(server.dedupe("progress", ["student_id", "lesson_id", "module_id"], keep_sort))
+
+
+def test_dedupe_keeps_the_newest_per_key(fake_db):
+    assert dedupe_progress() == 2
+    assert sorted(d["id"] for d in fake_db.progress.docs) == ["newest", "other-lesson", "s2-only"]
+
+
+def test_deduped_ids_come_back_as_deletions_from_sync(fake_db):
+    token = sync()["token"]
+    dedupe_progress()
+    asyncio.run(server.sync_sequence.publish())
+
+    changes = sync(token)
+    assert sorted(changes["deleted"]["progress"]) == ["old", "older"]
+    assert changes["progress"] == []
+    # Tombstones are scoped like the documents were
+    assert sync(token, {"id": "s2", "role": "student"})["deleted"]["progress"] == []
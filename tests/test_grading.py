@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+import server
+from fakes import FakeCollection
+from server import GradeBatch, grade_submissions
+
+TEACHER = {"id": "t1", "role": "teacher"}
+
+
+class FakeDB:
+    def __init__(self):
+        self.users = FakeCollection([{"id": "s2", "role": "student", "class_name": "Class 8A", "school": "School 1"}])
+        self.submissions = FakeCollection([
+            {"id": "sub1", "student_id": "s1", "class_name": "Class 8A", "school": "School 1", "marks": None},
+            {"id": "sub2", "student_id": "s1", "class_name": "Class 8A", "school": "School 1", "marks": 6},
+            # Made before submissions carried class and school
+            {"id": "sub3", "student_id": "s2", "marks": None},
+        ])
+        self.analytics_rollups = FakeCollection()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(server, "db", fake)
+    return fake
+
+
+def grade(*grades):
+    batch = GradeBatch(grades=[{"submission_id": s, "marks": m, "feedback": f"{m}/10"} for s, m in grades])
+    return asyncio.run(grade_submissions(batch, TEACHER))
+
+
+def rollup(fake_db, scope, key):
+    return next(d for d in fake_db.analytics_rollups.docs if (d["scope"], d["key"]) == (scope, key))
+
+
+def test_reports_a_result_per_submission(fake_db):
+    result = grade(("sub1", 8), ("missing", 5))
+    assert (result["graded"], result["not_found"]) == (1, 1)
+    assert result["results"] == [
+        {"submission_id": "sub1", "status": "graded"},
+        {"submission_id": "missing", "status": "not_found"},
+    ]
+    stored = next(d for d in fake_db.submissions.docs if d["id"] == "sub1")
+    assert (stored["marks"], stored["feedback"]) == (8, "8/10")
+
+
+def test_rollups_count_first_grades_and_regrade_deltas(fake_db):
+    grade(("sub1", 8), ("sub2", 9))
+    class_rollup = rollup(fake_db, "class", "Class 8A")
+    # sub2 was already graded (6): only its marks change
+    assert (class_rollup["graded_submissions"], class_rollup["marks_sum"]) == (1, 8 + 3)
+
+    grade(("sub1", 5))
+    assert (class_rollup["graded_submissions"], class_rollup["marks_sum"]) == (1, 8)
+
+
+def test_last_grade_wins_within_one_batch(fake_db):
+    result = grade(("sub1", 4), ("sub1", 7))
+    assert result["graded"] == 1 and len(result["results"]) == 1
+    assert next(d for d in fake_db.submissions.docs if d["id"] == "sub1")["marks"] == 7
+    assert rollup(fake_db, "student", "s1")["marks_sum"] == 7
+
+
+def test_older_submissions_roll_up_through_their_student(fake_db):
+    grade(("sub3", 9))
+    assert rollup(fake_db, "class", "Class 8A")["marks_sum"] == 9
+    assert rollup(fake_db, "school", "School 1")["graded_submissions"] == 1
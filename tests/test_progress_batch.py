@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+
+import server
+from server import ProgressBatch
+
+
+def ts(day: int) -> datetime:
+    return datetime(2025, 3, day, tzinfo=timezone.utc)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeProgress:
+    """Enough of db.progress for write_progress(): the unique key on
+    (student_id, lesson_id, module_id) and the LWW filter on client_timestamp."""
+
+    def __init__(self):
+        self.docs = []
+
+    def _key(self, doc):
+        return (doc["student_id"], doc.get("lesson_id"), doc.get("module_id"))
+
+    def find(self, query, projection=None):
+        keys = {self._key(k) for k in query["$or"]}
+        return FakeCursor([dict(d) for d in self.docs if self._key(d) in keys])
+
+    async def bulk_write(self, ops, ordered=True):
+        errors = []
+        for index, op in enumerate(ops):
+            stamp = op._doc["$set"]["client_timestamp"]
+            existing = next((d for d in self.docs if self._key(d) == self._key(op._filter)), None)
+            if existing is None:
+                self.docs.append({**{k: v for k, v in op._filter.items() if k != "$or"},
+                                  **op._doc["$set"], **op._doc["$setOnInsert"]})
+            elif existing["client_timestamp"] <= stamp:
+                existing.update(op._doc["$set"])
+            else:
+                # The filter misses the newer document, so the upsert collides with it
+                errors.append({"index": index, "code": 11000})
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+class FakeRollups:
+    def __init__(self):
+        self.counters = {}
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            target = self.counters.setdefault((op._filter["scope"], op._filter["key"]), {})
+            for name, amount in op._doc["$inc"].items():
+                target[name] = target.get(name, 0) + amount
+
+
+class FakeCounters:
+    def __init__(self):
+        self.value = 0
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        # Reserves a range of sync sequences
+        self.value += server.sync_sequence.batch
+        return {"value": self.value}
+
+
+class FakeDB:
+    def __init__(self):
+        self.progress = FakeProgress()
+        self.analytics_rollups = FakeRollups()
+        self.counters = FakeCounters()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(server, "db", fake)
+    monkeypatch.setattr(server, "ready_indexes", {("progress", "student_lesson_module_unique")})
+    monkeypatch.setattr(server, "sync_sequence", server.SyncSequence(batch=100, refresh=60))
+    return fake
+
+
+STUDENT = {"id": "s1", "role": "student", "class_name": "Class 8A", "school": "School 1"}
+
+
+def sync(events):
+    return asyncio.run(server.sync_progress_batch(ProgressBatch(events=events), STUDENT))
+
+
+def event(lesson_id, pct, day):
+    return {"lesson_id": lesson_id, "completion_percentage": pct, "time_spent": 60, "client_timestamp": ts(day)}
+
+
+def test_batch_applies_newer_and_reports_stale(fake_db):
+    assert sync([event("l1", 40, 5)])["applied"] == 1
+
+    result = sync([event("l1", 10, 3), event("l2", 20, 3)])
+    assert result["applied"] == 1 and result["stale"] == 1
+    assert {(r["lesson_id"], r["status"]) for r in result["results"]} == {("l1", "stale"), ("l2", "applied")}
+    stored = {d["lesson_id"]: d["completion_percentage"] for d in fake_db.progress.docs}
+    assert stored == {"l1": 40, "l2": 20}
+
+    result = sync([event("l1", 90, 6)])
+    assert result["results"][0]["status"] == "applied"
+    assert {d["lesson_id"]: d["completion_percentage"] for d in fake_db.progress.docs}["l1"] == 90
+
+
+def test_batch_collapses_events_to_the_newest(fake_db):
+    result = sync([event("l1", 50, 4), event("l1", 70, 6), event("l1", 60, 5)])
+    assert result["applied"] == 1 and len(result["results"]) == 1
+    assert fake_db.progress.docs[0]["completion_percentage"] == 70
+
+
+def test_batch_rollups_count_only_applied_events(fake_db):
+    sync([event("l1", 40, 5)])
+    sync([event("l1", 10, 3)])  # stale: no rollup change
+    sync([event("l1", 60, 6)])
+    class_rollup = fake_db.analytics_rollups.counters[("class", "Class 8A")]
+    assert class_rollup == {"progress_records": 1, "completion_sum": 60}
+
+
+def test_batch_refused_without_unique_index(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "ready_indexes", set())
+    with pytest.raises(HTTPException) as excinfo:
+        sync([event("l1", 40, 5)])
+    assert excinfo.value.status_code == 503
+    assert fake_db.progress.docs == []
+
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+import server
+from fakes import FakeCounters
+
+STUDENT = {"id": "s1", "role": "student", "class_name": "Class 8A", "school": "School 1"}
+
+
+class FakeDB:
+    def __init__(self):
+        # Flushes take a sync sequence; write_progress is faked per test
+        self.counters = FakeCounters()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(server, "db", fake)
+    monkeypatch.setattr(server, "sync_sequence", server.SyncSequence(batch=100, refresh=60))
+    return fake
+
+
+def heartbeat(lesson_id):
+    return server.ProgressUpdate(lesson_id=lesson_id, completion_percentage=40, time_spent=60)
+
+
+def test_buffer_stop_waits_for_an_inflight_flush(fake_db, monkeypatch):
+    written = []
+
+    async def slow_write(entries):
+        await asyncio.sleep(0.05)
+        written.extend(key["lesson_id"] for key, _, _ in entries)
+
+    monkeypatch.setattr(server, "write_progress", slow_write)
+
+    async def scenario():
+        buffer = server.ProgressBuffer(interval=0.01, max_entries=100, limit=100)
+        buffer.start()
+        buffer.put(STUDENT, heartbeat("l1"))
+        while not buffer.stats()["flushing"]:
+            await asyncio.sleep(0.005)
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert written == ["l1"]
+    assert buffer.pending() == []
+
+
+def test_buffer_refuses_new_keys_when_full(fake_db):
+    async def scenario():
+        buffer = server.ProgressBuffer(interval=60, max_entries=100, limit=2)
+        assert buffer.put(STUDENT, heartbeat("l1")) and buffer.put(STUDENT, heartbeat("l2"))
+        assert not buffer.put(STUDENT, heartbeat("l3"))
+        assert buffer.put(STUDENT, heartbeat("l1"))  # an existing key still coalesces
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert buffer.stats()["rejected"] == 1
+    assert sorted(p["lesson_id"] for p in buffer.pending()) == ["l1", "l2"]
+
+
+def test_failed_size_triggered_flush_is_logged_and_kept(fake_db, monkeypatch, caplog):
+    monkeypatch.setattr(server, "ready_indexes", set())  # write_progress refuses with 503
+
+    async def scenario():
+        buffer = server.ProgressBuffer(interval=60, max_entries=1, limit=100)
+        buffer.put(STUDENT, heartbeat("l1"))
+        await asyncio.gather(*buffer._flush_tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert buffer.stats()["failures"] == 1 and not buffer._flush_tasks
+    assert [p["lesson_id"] for p in buffer.pending()] == ["l1"]
+    assert "Progress buffer flush failed" in caplog.text
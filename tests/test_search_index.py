@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import server
+from server import SearchIndex, edit_distance, max_typos
+
+LESSONS = [
+    {"id": "water", "title": {"english": "The Water Cycle", "hindi": "पानी का चक्र", "punjabi": "ਪਾਣੀ ਦਾ ਚੱਕਰ"},
+     "description": {"english": "How water moves between land, sea and sky"}},
+    {"id": "fractions", "title": {"english": "Adding Fractions", "hindi": "भिन्नों का जोड़", "punjabi": "ਭਿੰਨਾਂ ਦਾ ਜੋੜ"},
+     "description": {"english": "Fractions with like and unlike denominators"}},
+    {"id": "history", "title": {"english": "History of Punjab", "hindi": "पंजाब का इतिहास", "punjabi": "ਪੰਜਾਬ ਦਾ ਇਤਿਹਾਸ"}},
+    {"id": "energy", "title": {"english": "Solar Energy", "hindi": "सौर ऊर्जा", "punjabi": "ਸੂਰਜੀ ਊਰਜਾ"}},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    index = SearchIndex()
+    for lesson in LESSONS:
+        index.add("lesson", lesson)
+    return index
+
+
+def top(index, query):
+    results = index.search(query)
+    return results[0]["id"] if results else None
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("water", "water"),
+    ("watr", "water"),
+    ("wter", "water"),
+    ("fracton", "fractions"),
+    ("fractoins", "fractions"),
+    ("histroy", "history"),
+    ("enrgy", "energy"),
+])
+def test_latin_typos(index, query, expected):
+    assert top(index, query) == expected
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("ਪਾਣੀ", "water"),
+    ("ਪਾਨੀ", "water"),   # ਣ typed as ਨ
+    ("ਚਕਰ", "water"),    # addak dropped
+    ("ਇਤਹਾਸ", "history"),  # vowel sign dropped
+])
+def test_gurmukhi_typos(index, query, expected):
+    assert top(index, query) == expected
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("पानी", "water"),
+    ("पनी", "water"),    # matra dropped
+    ("इतिहस", "history"),
+    ("उर्जा", "energy"),  # short vowel for long
+])
+def test_devanagari_typos(index, query, expected):
+    assert top(index, query) == expected
+
+
+def test_unrelated_terms_do_not_match(index):
+    assert index.search("xylophone") == []
+    assert index.search("zz") == []
+
+
+def test_exact_match_outranks_fuzzy(index):
+    index = SearchIndex()
+    index.add("lesson", {"id": "fraction", "title": {"english": "fraction"}})
+    index.add("lesson", {"id": "friction", "title": {"english": "friction"}})
+    assert [r["id"] for r in index.search("fraction")] == ["fraction"]
+    assert top(index, "frction") in {"fraction", "friction"}
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert edit_distance("histroy", "history", 2) == 1
+    assert edit_distance("watr", "water", 1) == 1
+    assert edit_distance("ਚਕਰ", "ਚੱਕਰ", 1) == 1
+    assert edit_distance("cat", "dog", 1) == 2  # limit + 1 once exceeded
+
+
+def test_max_typos_scales_with_length():
+    assert max_typos("ab") == 0
+    assert max_typos("पनी") == 1
+    assert max_typos("watr") == 1
+    assert max_typos("fracton") == 2
+    assert max_typos("fractoins") == 2
+
+
+def test_concurrent_refreshes_share_one_rebuild_and_log_failures(monkeypatch, caplog):
+    calls = []
+
+    async def failing_rebuild():
+        calls.append(1)
+        await asyncio.sleep(0)
+        raise RuntimeError("catalog unavailable")
+
+    monkeypatch.setattr(server.search_index, "rebuild", failing_rebuild)
+    monkeypatch.setattr(server.app.state, "search_index_task", None, raising=False)
+
+    async def scenario():
+        first, second = server.refresh_search_index(), server.refresh_search_index()
+        assert first is second
+        with pytest.raises(RuntimeError):
+            await first
+        await asyncio.sleep(0)  # let the done callback run
+        retry = server.refresh_search_index()
+        assert retry is not first
+        with pytest.raises(RuntimeError):
+            await retry
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert "Search index rebuild failed" in caplog.text
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from server import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Backend:
+    """A slow read that counts how often it really runs."""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.release = None
+        self.result = result
+        self.error = error
+
+    async def read(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_identical_reads_share_one_call():
+    flight = SingleFlight(enabled=True)
+    backend = Backend(result={"lessons": 3})
+
+    async def scenario():
+        backend.release = asyncio.Event()
+        waiters = [asyncio.create_task(flight.do("lessons", ("l1",), backend.read)) for _ in range(5)]
+        await asyncio.sleep(0)
+        backend.release.set()
+        return await asyncio.gather(*waiters)
+
+    results = run(scenario())
+    assert backend.calls == 1
+    assert all(r is results[0] for r in results)
+    assert (flight.leaders, flight.coalesced) == (1, 4)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_keys_do_not_share():
+    flight = SingleFlight(enabled=True)
+    backend = Backend(result=1)
+
+    async def scenario():
+        backend.release = asyncio.Event()
+        backend.release.set()
+        return await asyncio.gather(flight.do("lessons", ("l1",), backend.read),
+                                    flight.do("lessons", ("l2",), backend.read))
+
+    run(scenario())
+    assert backend.calls == 2
+
+
+def test_nothing_is_cached_after_the_call_lands():
+    flight = SingleFlight(enabled=True)
+    backend = Backend(result=1)
+
+    async def scenario():
+        backend.release = asyncio.Event()
+        backend.release.set()
+        await flight.do("lessons", ("l1",), backend.read)
+        await flight.do("lessons", ("l1",), backend.read)
+
+    run(scenario())
+    assert backend.calls == 2
+
+
+def test_errors_reach_every_waiter_and_the_next_call_retries():
+    flight = SingleFlight(enabled=True)
+    backend = Backend(error=RuntimeError("mongo down"))
+
+    async def scenario():
+        backend.release = asyncio.Event()
+        waiters = [asyncio.create_task(flight.do("analytics", ("8A",), backend.read)) for _ in range(3)]
+        await asyncio.sleep(0)
+        backend.release.set()
+        outcomes = await asyncio.gather(*waiters, return_exceptions=True)
+        backend.error = None
+        backend.result = "ok"
+        return outcomes, await flight.do("analytics", ("8A",), backend.read)
+
+    outcomes, retried = run(scenario())
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+    assert retried == "ok" and backend.calls == 2
+
+
+def test_a_cancelled_leader_does_not_cancel_the_others():
+    flight = SingleFlight(enabled=True)
+    backend = Backend(result="shared")
+
+    async def scenario():
+        backend.release = asyncio.Event()
+        leader = asyncio.create_task(flight.do("lessons", ("l1",), backend.read))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("lessons", ("l1",), backend.read))
+        await asyncio.sleep(0)
+        leader.cancel()
+        backend.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert run(scenario()) == "shared"
+    assert backend.calls == 1
+
+
+def test_disabled_runs_every_call():
+    flight = SingleFlight(enabled=False)
+    backend = Backend(result=1)
+
+    async def scenario():
+        backend.release = asyncio.Event()
+        backend.release.set()
+        await asyncio.gather(*(flight.do("lessons", ("l1",), backend.read) for _ in range(3)))
+
+    run(scenario())
+    assert backend.calls == 3 and flight.coalesced == 0
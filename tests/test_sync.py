@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+
+import server
+from fakes import FakeCollection, FakeCounters
+from server import change_stamp, record_tombstones, sync_write
+
+STUDENT_8A = {"id": "s1", "role": "student", "class_name": "Class 8A"}
+STUDENT_9A = {"id": "s2", "role": "student", "class_name": "Class 9A"}
+
+
+class FakeDB:
+    def __init__(self):
+        self.counters = FakeCounters()
+        self.tombstones = FakeCollection()
+        self.lessons = FakeCollection()
+        self.digital_literacy_modules = FakeCollection()
+        self.assignments = FakeCollection()
+        self.progress = FakeCollection()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(server, "db", fake)
+    monkeypatch.setattr(server, "sync_sequence", server.SyncSequence(batch=10, refresh=60))
+    return fake
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def sync(user, since=None):
+    response = run(server.sync_changes(since=since, lang=None, user=user))
+    return json.loads(response.body)
+
+
+async def add_assignment(fake_db, assignment_id, class_name):
+    async with sync_write() as seq:
+        await fake_db.assignments.insert_many([{"id": assignment_id, "class_name": class_name, **change_stamp(seq)}])
+    await server.sync_sequence.publish()
+
+
+async def delete_assignments(fake_db, query):
+    await record_tombstones("assignments", query)
+    await fake_db.assignments.delete_many(query)
+    await server.sync_sequence.publish()
+
+
+def test_incremental_sync_returns_only_newer_changes(fake_db):
+    run(add_assignment(fake_db, "a1", "Class 8A"))
+    first = sync(STUDENT_8A)
+    assert first["full"] and [a["id"] for a in first["assignments"]] == ["a1"]
+
+    run(add_assignment(fake_db, "a2", "Class 8A"))
+    changes = sync(STUDENT_8A, first["token"])
+    assert not changes["full"] and [a["id"] for a in changes["assignments"]] == ["a2"]
+    assert sync(STUDENT_8A, changes["token"])["assignments"] == []
+
+
+def test_deletions_come_back_as_tombstones_for_the_right_class(fake_db):
+    run(add_assignment(fake_db, "a1", "Class 8A"))
+    run(add_assignment(fake_db, "a2", "Class 9A"))
+    tokens = {user["id"]: sync(user)["token"] for user in (STUDENT_8A, STUDENT_9A)}
+
+    run(delete_assignments(fake_db, {"id": "a1"}))
+    assert sync(STUDENT_8A, tokens["s1"])["deleted"]["assignments"] == ["a1"]
+    assert sync(STUDENT_9A, tokens["s2"])["deleted"]["assignments"] == []
+    # A full sync has nothing to delete
+    assert sync(STUDENT_8A)["deleted"]["assignments"] == []
+
+
+def test_a_write_still_pending_holds_the_token_back(fake_db):
+    token = sync(STUDENT_8A)["token"]
+
+    async def scenario():
+        async with sync_write() as seq:
+            await fake_db.assignments.insert_many([{"id": "a1", "class_name": "Class 8A", **change_stamp(seq)}])
+            await server.sync_sequence.publish()
+            during = await sync_in_loop(token)
+        await server.sync_sequence.publish()
+        return during, await sync_in_loop(token)
+
+    async def sync_in_loop(since):
+        response = await server.sync_changes(since=since, lang=None, user=STUDENT_8A)
+        return json.loads(response.body)
+
+    during, after = run(scenario())
+    assert during["assignments"] == [] and during["token"] == token
+    assert [a["id"] for a in after["assignments"]] == ["a1"]
+
+
+def test_invalid_token_is_rejected(fake_db):
+    with pytest.raises(server.HTTPException) as excinfo:
+        sync(STUDENT_8A, "not base64!")
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,101 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+import server
+from fakes import FakeCounters
+from server import SyncSequence, current_sync_seq, sync_write
+
+
+class FakeDB:
+    def __init__(self):
+        self.counters = FakeCounters()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(server, "db", fake)
+    return fake
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_allocation_reserves_a_batch_per_round_trip(fake_db):
+    sequence = SyncSequence(batch=10, refresh=60)
+
+    async def scenario():
+        return [await sequence.allocate() for _ in range(25)]
+
+    assert run(scenario()) == list(range(1, 26))
+    assert fake_db.counters.round_trips == 3
+    assert fake_db.counters.doc["value"] == 30
+
+
+def test_processes_get_disjoint_ranges(fake_db):
+    first, second = SyncSequence(batch=10, refresh=60), SyncSequence(batch=10, refresh=60)
+
+    async def scenario():
+        return await first.allocate(), await second.allocate(), await first.allocate()
+
+    assert run(scenario()) == (1, 11, 2)
+
+
+def test_token_stays_below_the_lowest_pending_sequence(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "sync_sequence", SyncSequence(batch=10, refresh=60))
+    other = SyncSequence(batch=10, refresh=60)
+
+    async def scenario():
+        async with sync_write() as mine:
+            theirs = await other.allocate()
+            other.settle(theirs)
+            await other.publish()
+            await server.sync_sequence.publish()
+            assert (mine, theirs) == (1, 11)
+            # Our write is pending; the other process has given up its range
+            assert await current_sync_seq() == 0
+        await server.sync_sequence.publish()
+        return await current_sync_seq()
+
+    assert run(scenario()) == 20
+    assert fake_db.counters.doc["leases"] == {}
+
+
+def test_busy_lease_moves_up_to_its_lowest_pending(fake_db):
+    sequence = SyncSequence(batch=10, refresh=60)
+
+    async def scenario():
+        seqs = [await sequence.allocate() for _ in range(3)]
+        sequence.settle(seqs[0])
+        await sequence.publish()
+        return await current_sync_seq()
+
+    assert run(scenario()) == 1
+
+
+def test_expired_lease_stops_holding_the_token_back(fake_db, monkeypatch):
+    stale = SyncSequence(batch=10, refresh=60)
+
+    async def scenario():
+        await stale.allocate()  # never settled: the process died
+        lease = next(iter(fake_db.counters.doc["leases"].values()))
+        lease["at"] -= timedelta(seconds=server.SYNC_PENDING_TIMEOUT_SECONDS + 1)
+        return await current_sync_seq()
+
+    assert run(scenario()) == 10
+    assert fake_db.counters.doc["leases"] == {}
+
+
+def test_stop_releases_an_idle_range(fake_db):
+    sequence = SyncSequence(batch=10, refresh=60)
+
+    async def scenario():
+        sequence.settle(await sequence.allocate())
+        await sequence.stop()
+        return await current_sync_seq()
+
+    assert run(scenario()) == 10
+    assert sequence.stats()["leases"] == 0
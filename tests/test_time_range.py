@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from server import in_time_range, parse_timestamp, time_range
+
+
+def test_parse_timestamp_treats_naive_values_as_utc():
+    assert parse_timestamp("2025-03-04", "from") == datetime(2025, 3, 4, tzinfo=timezone.utc)
+    assert parse_timestamp("2025-03-04T10:30", "from") == datetime(2025, 3, 4, 10, 30, tzinfo=timezone.utc)
+    assert parse_timestamp("2025-03-04T10:30:00+05:30", "from") == datetime(2025, 3, 4, 5, 0, tzinfo=timezone.utc)
+    with pytest.raises(HTTPException) as excinfo:
+        parse_timestamp("yesterday", "from")
+    assert excinfo.value.status_code == 400
+
+
+def test_time_range_bare_date_to_includes_the_whole_day():
+    bounds = time_range("2025-03-01", "2025-03-04")
+    assert bounds == {"$gte": datetime(2025, 3, 1, tzinfo=timezone.utc),
+                      "$lt": datetime(2025, 3, 5, tzinfo=timezone.utc)}
+    assert in_time_range(datetime(2025, 3, 4, 23, 59, tzinfo=timezone.utc), bounds)
+    assert not in_time_range(datetime(2025, 3, 5, tzinfo=timezone.utc), bounds)
+
+
+def test_time_range_datetime_to_is_inclusive():
+    bounds = time_range(None, "2025-03-04T12:00:00Z")
+    end = datetime(2025, 3, 4, 12, tzinfo=timezone.utc)
+    assert bounds == {"$lte": end}
+    assert in_time_range(end, bounds)
+    assert not in_time_range(end + timedelta(milliseconds=1), bounds)
+
+
+def test_time_range_without_bounds():
+    assert time_range(None, None) is None
+    assert in_time_range(datetime.now(timezone.utc), None)
+
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import server
+from server import UserCache, create_token, get_current_user
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(server.time, "monotonic", clock)
+    return clock
+
+
+def user(user_id="u1"):
+    return {"id": user_id, "email": f"{user_id}@school.test", "role": "student"}
+
+
+def test_hit_returns_a_copy_and_counts(clock):
+    cache = UserCache(maxsize=10, ttl=60)
+    assert cache.get("t1") is None
+    cache.put("t1", {"user_id": "u1"}, user())
+    payload, cached = cache.get("t1")
+    cached["role"] = "admin"
+    assert cache.get("t1")[1]["role"] == "student"
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = UserCache(maxsize=10, ttl=60)
+    cache.put("t1", {"user_id": "u1"}, user())
+    clock.now += 59
+    assert cache.get("t1") is not None
+    clock.now += 1
+    assert cache.get("t1") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_entries_never_outlive_the_token(clock):
+    cache = UserCache(maxsize=10, ttl=3600)
+    cache.put("t1", {"user_id": "u1", "exp": time.time() + 5}, user())
+    clock.now += 6
+    assert cache.get("t1") is None
+
+
+def test_invalidate_user_drops_every_token_for_them(clock):
+    cache = UserCache(maxsize=10, ttl=60)
+    cache.put("t1", {}, user("u1"))
+    cache.put("t2", {}, user("u1"))
+    cache.put("t3", {}, user("u2"))
+    cache.invalidate_user("u1")
+    assert cache.get("t1") is None and cache.get("t2") is None
+    assert cache.get("t3") is not None
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = UserCache(maxsize=2, ttl=60)
+    cache.put("t1", {}, user("u1"))
+    cache.put("t2", {}, user("u2"))
+    cache.get("t1")
+    cache.put("t3", {}, user("u3"))
+    assert cache.get("t2") is None
+    assert cache.get("t1") is not None and cache.get("t3") is not None
+
+
+class FakeUsers:
+    def __init__(self, doc):
+        self.doc = doc
+        self.lookups = 0
+
+    async def find_one(self, query, projection=None):
+        self.lookups += 1
+        return dict(self.doc) if self.doc and query["id"] == self.doc["id"] else None
+
+
+class FakeDB:
+    def __init__(self, doc):
+        self.users = FakeUsers(doc)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDB(user())
+    monkeypatch.setattr(server, "db", fake)
+    monkeypatch.setattr(server, "user_cache", UserCache(maxsize=10, ttl=60))
+    return fake
+
+
+def authenticate(token):
+    return asyncio.run(get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+
+
+def test_get_current_user_reads_mongo_once_per_token(fake_db):
+    token = create_token("u1", "u1@school.test", "student")
+    assert authenticate(token)["id"] == "u1"
+    assert authenticate(token)["id"] == "u1"
+    assert fake_db.users.lookups == 1
+
+    server.user_cache.invalidate_user("u1")
+    authenticate(token)
+    assert fake_db.users.lookups == 2
+
+
+def test_get_current_user_rejects_bad_tokens_without_caching(fake_db):
+    with pytest.raises(HTTPException) as excinfo:
+        authenticate("not-a-token")
+    assert excinfo.value.status_code == 401
+    assert server.user_cache.stats()["size"] == 0